@@ -0,0 +1,212 @@
+#ifndef ADJACENCY_H
+#define ADJACENCY_H
+
+#include <algorithm>
+
+#include "graph.h"
+#include "numa_policy.h"
+#include "parlay/parallel.h"
+#include "parlay/primitives.h"
+#include "parlay/sequence.h"
+
+using namespace std;
+using namespace parlay;
+
+// symmetric: the adjacency list of a symmetrized graph
+// in: in-cores, the degree of a vertex is its in-degree
+// out: out-cores, the degree of a vertex is its out-degree
+// undirected: the union of out- and in-neighbors of a directed graph
+enum class CoreMode { symmetric, in, out, undirected };
+
+// The neighborhoods peeling works on. When u is peeled, the degree of every
+// vertex in peel(u) drops by one, and the degree of u is the number of its
+// neighbors in count(u). For symmetric graphs both are the adjacency list.
+// Directed modes need sorted out-edges and the in-edges from make_inverse;
+// self-loops and repeated edges are skipped on the fly, and the undirected
+// mode skips an in-neighbor that is also an out-neighbor.
+template <class Graph>
+class Adjacency {
+  using NodeId = typename Graph::NodeId;
+  using EdgeId = typename Graph::EdgeId;
+  using Edge = typename Graph::Edge;
+
+  const Graph &G;
+  CoreMode mode;
+  sequence<NodeId> degrees;
+  size_t m;
+  // one copy of G per NUMA node, or null to scan G itself
+  const sequence<Graph> *replicas = nullptr;
+
+  // the copy of G local to the calling worker
+  const Graph &local() const {
+    return replicas ? (*replicas)[current_numa_node()] : G;
+  }
+
+  bool is_out_neighbor(const Graph &g, NodeId u, NodeId v) const {
+    auto begin = g.edges.begin() + g.offsets[u];
+    auto end = g.edges.begin() + g.offsets[u + 1];
+    auto it = std::lower_bound(begin, end, v,
+                               [](const Edge &e, NodeId x) { return e.v < x; });
+    return it != end && it->v == v;
+  }
+
+  // the i-th edge of u in a sorted CSR, unless it is a self-loop or a repeat
+  bool valid(const sequence<EdgeId> &offsets, const sequence<Edge> &edges,
+             NodeId u, EdgeId i) const {
+    NodeId v = edges[i].v;
+    return v != u && (i == offsets[u] || edges[i - 1].v != v);
+  }
+
+  bool valid_in(const Graph &g, NodeId u, EdgeId i) const {
+    return valid(g.in_offsets, g.in_edges, u, i) &&
+           (mode != CoreMode::undirected ||
+            !is_out_neighbor(g, u, g.in_edges[i].v));
+  }
+
+  template <class F>
+  void map_csr(const Graph &g, bool in, NodeId u, F f, bool parallel) const {
+    auto &offsets = in ? g.in_offsets : g.offsets;
+    auto &edges = in ? g.in_edges : g.edges;
+    auto visit = [&](EdgeId i) {
+      if (in ? valid_in(g, u, i) : valid(offsets, edges, u, i)) {
+        f(edges[i].v);
+      }
+    };
+    if (parallel) {
+      parallel_for(offsets[u], offsets[u + 1], visit);
+    } else {
+      for (EdgeId i = offsets[u]; i < offsets[u + 1]; i++) {
+        visit(i);
+      }
+    }
+  }
+
+  template <class F>
+  void map_mode(NodeId u, F f, bool parallel, bool uses_out,
+                bool uses_in) const {
+    const Graph &g = local();
+    if (mode == CoreMode::symmetric) {
+      if (parallel) {
+        parallel_for(g.offsets[u], g.offsets[u + 1],
+                     [&](EdgeId i) { f(g.edges[i].v); });
+      } else {
+        for (EdgeId i = g.offsets[u]; i < g.offsets[u + 1]; i++) {
+          f(g.edges[i].v);
+        }
+      }
+      return;
+    }
+    if (uses_out && uses_in && parallel) {
+      par_do([&]() { map_csr(local(), false, u, f, true); },
+             [&]() { map_csr(local(), true, u, f, true); });
+      return;
+    }
+    if (uses_out) {
+      map_csr(g, false, u, f, parallel);
+    }
+    if (uses_in) {
+      map_csr(g, true, u, f, parallel);
+    }
+  }
+
+ public:
+  Adjacency(const Graph &_G, CoreMode _mode = CoreMode::symmetric)
+      : G(_G), mode(_mode), m(G.m) {
+    if (mode == CoreMode::symmetric) {
+      return;
+    }
+    if (G.in_offsets.size() != G.n + 1) {
+      std::cerr << "Error: directed core modes require in-edges" << std::endl;
+      abort();
+    }
+    degrees = tabulate(G.n, [&](NodeId u) {
+      return count(u, [](NodeId) { return true; });
+    });
+    m = reduce(map(degrees, [](NodeId d) { return (size_t)d; }));
+  }
+
+  // scans the copies of G in replicas instead of G, each from its node
+  void set_replicas(const sequence<Graph> *_replicas) {
+    replicas = _replicas && !_replicas->empty() ? _replicas : nullptr;
+  }
+
+  size_t num_vertices() const { return G.n; }
+  // total degree over all vertices
+  size_t num_edges() const { return m; }
+  CoreMode core_mode() const { return mode; }
+
+  NodeId degree(NodeId u) const {
+    if (mode == CoreMode::symmetric) {
+      return local().offsets[u + 1] - local().offsets[u];
+    }
+    return degrees[u];
+  }
+
+  // number of edges scanned by map_peel, to choose between sequential and
+  // parallel scans
+  size_t peel_size(NodeId u) const {
+    const Graph &g = local();
+    size_t size = 0;
+    if (mode != CoreMode::out) {
+      size += g.offsets[u + 1] - g.offsets[u];
+    }
+    if (mode == CoreMode::out || mode == CoreMode::undirected) {
+      size += g.in_offsets[u + 1] - g.in_offsets[u];
+    }
+    return size;
+  }
+
+  // calls f(v) for every v in peel(u)
+  template <class F>
+  void map_peel(NodeId u, F f, bool parallel) const {
+    map_mode(u, f, parallel, mode != CoreMode::out, mode != CoreMode::in);
+  }
+
+  // number of v in count(u) with pred(v)
+  template <class Pred>
+  NodeId count(NodeId u, Pred pred) const {
+    const Graph &g = local();
+    if (mode == CoreMode::symmetric) {
+      return count_if(g.edges.cut(g.offsets[u], g.offsets[u + 1]),
+                      [&](auto &e) { return pred(e.v); });
+    }
+    auto count_csr = [&](bool in) {
+      auto &offsets = in ? g.in_offsets : g.offsets;
+      auto &edges = in ? g.in_edges : g.edges;
+      auto hits = delayed_seq<bool>(
+          offsets[u + 1] - offsets[u], [&](size_t j) {
+            EdgeId i = offsets[u] + j;
+            return (in ? valid_in(g, u, i) : valid(offsets, edges, u, i)) &&
+                   pred(edges[i].v);
+          });
+      return parlay::count(hits, true);
+    };
+    size_t c = 0;
+    if (mode != CoreMode::in) {
+      c += count_csr(false);
+    }
+    if (mode != CoreMode::out) {
+      c += count_csr(true);
+    }
+    return c;
+  }
+};
+
+// an upper bound on every degree in the given mode from the CSR sizes alone,
+// counting self-loops and repeated edges
+template <class Graph>
+size_t max_degree_bound(const Graph &G, CoreMode mode = CoreMode::symmetric) {
+  auto bounds = delayed_seq<size_t>(G.n, [&](size_t u) {
+    size_t d = 0;
+    if (mode != CoreMode::in) {
+      d += G.offsets[u + 1] - G.offsets[u];
+    }
+    if (mode == CoreMode::in || mode == CoreMode::undirected) {
+      d += G.in_offsets[u + 1] - G.in_offsets[u];
+    }
+    return d;
+  });
+  return reduce(bounds, maxm<size_t>());
+}
+
+#endif  // ADJACENCY_H
@@ -0,0 +1,228 @@
+#ifndef BATCH_H
+#define BATCH_H
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <fstream>
+
+#include "graph.h"
+#include "kcore.h"
+#include "parlay/parallel.h"
+#include "parlay/primitives.h"
+#include "parlay/sequence.h"
+
+using namespace std;
+using namespace parlay;
+
+// Many symmetric graphs stored as one concatenated CSR. Member i owns the
+// vertices [starts[i], starts[i + 1]), whose neighbor lists are
+// offsets[starts[i]] to offsets[starts[i + 1]] in edges and hold ids local to
+// the member. Members must not have self-loops or repeated edges.
+//
+// Binary layout: num_graphs, n and m as uint64, followed by starts
+// (num_graphs + 1 uint64), offsets (n + 1 uint64) and edges (m uint32).
+struct GraphBatch {
+  using NodeId = uint32_t;
+  using EdgeId = uint64_t;
+
+  size_t num_graphs = 0;
+  size_t n = 0;
+  size_t m = 0;
+  sequence<EdgeId> starts;
+  sequence<EdgeId> offsets;
+  sequence<NodeId> edges;
+
+  size_t num_vertices(size_t i) const { return starts[i + 1] - starts[i]; }
+  size_t num_edges(size_t i) const {
+    return offsets[starts[i + 1]] - offsets[starts[i]];
+  }
+
+  // a standalone copy of member i
+  Graph<NodeId, EdgeId> member(size_t i) const {
+    Graph<NodeId, EdgeId> G;
+    G.n = num_vertices(i);
+    G.m = num_edges(i);
+    G.symmetrized = true;
+    EdgeId first = offsets[starts[i]];
+    G.offsets = tabulate(G.n + 1, [&](size_t u) {
+      return offsets[starts[i] + u] - first;
+    });
+    G.edges = tabulate(G.m, [&](size_t j) {
+      return typename Graph<NodeId, EdgeId>::Edge(edges[first + j]);
+    });
+    return G;
+  }
+
+  // all members as one graph, with global vertex ids. A vertex has the same
+  // coreness in it as in its member.
+  Graph<NodeId, EdgeId> disjoint_union() const {
+    Graph<NodeId, EdgeId> G;
+    G.n = n;
+    G.m = m;
+    G.symmetrized = true;
+    G.offsets = offsets;
+    G.edges = sequence<typename Graph<NodeId, EdgeId>::Edge>::uninitialized(m);
+    parallel_for(0, num_graphs, [&](size_t i) {
+      parallel_for(offsets[starts[i]], offsets[starts[i + 1]], [&](size_t j) {
+        G.edges[j] = edges[j] + starts[i];
+      });
+    });
+    return G;
+  }
+
+  void read(char const *filename) {
+    struct stat sb;
+    int fd = open(filename, O_RDONLY);
+    if (fd == -1) {
+      std::cerr << "Error: Cannot open file " << filename << std::endl;
+      abort();
+    }
+    if (fstat(fd, &sb) == -1) {
+      std::cerr << "Error: Unable to acquire file stat" << std::endl;
+      abort();
+    }
+    size_t len = sb.st_size;
+    char *data =
+        static_cast<char *>(mmap(0, len, PROT_READ, MAP_PRIVATE, fd, 0));
+    close(fd);
+    if (data == MAP_FAILED || len < 3 * sizeof(uint64_t)) {
+      std::cerr << "Error: Bad batch file " << filename << std::endl;
+      abort();
+    }
+    auto header = reinterpret_cast<uint64_t *>(data);
+    num_graphs = header[0];
+    n = header[1];
+    m = header[2];
+    if (len != (3 + num_graphs + 1 + n + 1) * sizeof(uint64_t) +
+                   m * sizeof(NodeId)) {
+      std::cerr << "Error: Bad batch file " << filename << std::endl;
+      abort();
+    }
+    auto starts_in = header + 3;
+    auto offsets_in = starts_in + num_graphs + 1;
+    auto edges_in = reinterpret_cast<NodeId *>(offsets_in + n + 1);
+    starts = tabulate(num_graphs + 1, [&](size_t i) { return starts_in[i]; });
+    offsets = tabulate(n + 1, [&](size_t i) { return offsets_in[i]; });
+    edges = tabulate(m, [&](size_t i) { return edges_in[i]; });
+    munmap(data, len);
+  }
+
+  void write(char const *filename) const {
+    std::ofstream ofs(filename);
+    if (!ofs.is_open()) {
+      std::cerr << "Error: Cannot open file " << filename << std::endl;
+      abort();
+    }
+    uint64_t header[3] = {num_graphs, n, m};
+    ofs.write(reinterpret_cast<char *>(header), sizeof(header));
+    ofs.write(reinterpret_cast<const char *>(starts.begin()),
+              sizeof(EdgeId) * (num_graphs + 1));
+    ofs.write(reinterpret_cast<const char *>(offsets.begin()),
+              sizeof(EdgeId) * (n + 1));
+    ofs.write(reinterpret_cast<const char *>(edges.begin()),
+              sizeof(NodeId) * m);
+    ofs.close();
+  }
+};
+
+// Coreness of every member of a batch, concatenated in member order. Members
+// with fewer than large_edges edges are each peeled sequentially by the
+// bucket algorithm of Batagelj and Zaversnik, in parallel across members, so
+// a member costs O(n + m) work and no solver allocation. Larger members are
+// decomposed one after another by the parallel KCore.
+class BatchKCore {
+  using NodeId = GraphBatch::NodeId;
+  using EdgeId = GraphBatch::EdgeId;
+
+  const GraphBatch &B;
+  size_t large_edges;
+  sequence<NodeId> large;
+  sequence<NodeId> coreness;
+
+  // peels member i; core starts as the degrees and ends as the coreness
+  void peel_small(size_t i) {
+    size_t n = B.num_vertices(i);
+    if (n == 0) {
+      return;
+    }
+    auto offsets = B.offsets.cut(B.starts[i], B.starts[i + 1] + 1);
+    auto core = coreness.cut(B.starts[i], B.starts[i + 1]);
+    NodeId max_degree = 0;
+    for (size_t v = 0; v < n; v++) {
+      core[v] = offsets[v + 1] - offsets[v];
+      max_degree = std::max(max_degree, core[v]);
+    }
+    // vertices sorted by degree; bin[d] is the first position of degree d
+    auto bin = sequence<NodeId>(max_degree + 1, 0);
+    auto pos = sequence<NodeId>::uninitialized(n);
+    auto vert = sequence<NodeId>::uninitialized(n);
+    for (size_t v = 0; v < n; v++) {
+      bin[core[v]]++;
+    }
+    NodeId start = 0;
+    for (size_t d = 0; d <= max_degree; d++) {
+      NodeId count = bin[d];
+      bin[d] = start;
+      start += count;
+    }
+    for (size_t v = 0; v < n; v++) {
+      pos[v] = bin[core[v]]++;
+      vert[pos[v]] = v;
+    }
+    for (size_t d = max_degree; d > 0; d--) {
+      bin[d] = bin[d - 1];
+    }
+    bin[0] = 0;
+    for (size_t j = 0; j < n; j++) {
+      NodeId v = vert[j];
+      for (EdgeId e = offsets[v]; e < offsets[v + 1]; e++) {
+        NodeId u = B.edges[e];
+        if (core[u] > core[v]) {
+          // swap u with the first vertex of its degree, then shrink it
+          NodeId du = core[u], pu = pos[u], pw = bin[du], w = vert[pw];
+          if (u != w) {
+            pos[u] = pw;
+            vert[pu] = w;
+            pos[w] = pu;
+            vert[pw] = u;
+          }
+          bin[du]++;
+          core[u]--;
+        }
+      }
+    }
+  }
+
+ public:
+  BatchKCore(const GraphBatch &_B, size_t _large_edges = 1 << 20)
+      : B(_B), large_edges(_large_edges) {
+    large = pack_index<NodeId>(delayed_seq<bool>(B.num_graphs, [&](size_t i) {
+      return B.num_edges(i) >= large_edges;
+    }));
+    coreness = sequence<NodeId>::uninitialized(B.n);
+  }
+
+  size_t num_large() const { return large.size(); }
+
+  sequence<NodeId> kcore() {
+    parallel_for(0, B.num_graphs, [&](size_t i) {
+      if (B.num_edges(i) < large_edges) {
+        peel_small(i);
+      }
+    });
+    for (NodeId i : large) {
+      auto G = B.member(i);
+      KCore solver(G);
+      auto member_core = solver.kcore();
+      parallel_for(0, G.n, [&](size_t v) {
+        coreness[B.starts[i] + v] = member_core[v];
+      });
+    }
+    return coreness;
+  }
+};
+
+#endif  // BATCH_H
@@ -0,0 +1,170 @@
+#ifndef DCORE_H
+#define DCORE_H
+
+#include <limits>
+
+#include "adjacency.h"
+#include "graph.h"
+#include "hashbag.h"
+#include "kcore.h"
+#include "parlay/parallel.h"
+#include "parlay/primitives.h"
+#include "parlay/sequence.h"
+#include "utils.h"
+
+using namespace std;
+using namespace parlay;
+
+// (k, l)-D-cores of a directed graph: the maximal subgraph in which every
+// vertex has in-degree at least k and out-degree at least l. For a fixed l,
+// dcore() returns for every vertex the largest k such that it belongs to the
+// (k, l)-D-core, or NONE if it is not even in the (0, l)-D-core. With l = 0
+// this is the in-coreness.
+//
+// Vertices are peeled level by level as in approx_kcore: at level k, every
+// vertex whose in-degree drops to k or whose out-degree drops below l is
+// removed and gets k. Empty levels are skipped.
+template <class Graph>
+class DCore {
+  using NodeId = typename Graph::NodeId;
+
+  static constexpr uint32_t local_queue_size = 128;
+  static constexpr size_t BLOCK_SIZE = 128;
+
+  Adjacency<Graph> in_adj;
+  Adjacency<Graph> out_adj;
+  NodeId l;
+  hashbag<NodeId> bag;
+  sequence<NodeId> frontier;
+  sequence<NodeId> in_deg;
+  sequence<NodeId> out_deg;
+  sequence<NodeId> dcoreness;
+  sequence<bool> alive;
+
+  // removes u and decrements its neighbors; vertices reaching in-degree k (if
+  // by_in) or out-degree l - 1 are peeled in the current level too
+  void peel_vertex(NodeId u, NodeId k, bool by_in, NodeId *local_queue,
+                   size_t &rear) {
+    auto enqueue = [&](NodeId v, bool sequential) {
+      if (sequential && rear < local_queue_size) {
+        local_queue[rear++] = v;
+      } else {
+        bag.insert(v);
+      }
+    };
+    // the in-degree of a vertex drops when one of its in-neighbors is peeled
+    bool sequential = in_adj.peel_size(u) < BLOCK_SIZE;
+    in_adj.map_peel(
+        u,
+        [&](NodeId v) {
+          if (alive[v] && in_deg[v] > k) {
+            auto [id, succeed] = fetch_and_add_bounded(&in_deg[v], -1, k);
+            if (by_in && succeed && id == k + 1) {
+              enqueue(v, sequential);
+            }
+          }
+        },
+        !sequential);
+    if (l == 0) {
+      return;
+    }
+    sequential = out_adj.peel_size(u) < BLOCK_SIZE;
+    out_adj.map_peel(
+        u,
+        [&](NodeId v) {
+          if (alive[v] && out_deg[v] >= l) {
+            auto [id, succeed] = fetch_and_add_bounded(&out_deg[v], -1, l - 1);
+            if (succeed && id == l) {
+              enqueue(v, sequential);
+            }
+          }
+        },
+        !sequential);
+  }
+
+  // peels the vertices in the bag and everything they cascade to
+  size_t peel(NodeId k, NodeId value, bool by_in) {
+    size_t num_rounds = 0;
+    auto size = bag.pack_into(make_slice(frontier));
+    while (size) {
+      num_rounds++;
+      parallel_for(
+          0, size,
+          [&](size_t j) {
+            NodeId local_queue[local_queue_size];
+            size_t front = 0, rear = 0;
+            local_queue[rear++] = frontier[j];
+            while (front < rear) {
+              NodeId u = local_queue[front++];
+              if (atomic_compare_and_swap(&alive[u], true, false)) {
+                dcoreness[u] = value;
+                peel_vertex(u, k, by_in, local_queue, rear);
+              }
+            }
+          },
+          1);
+      size = bag.pack_into(make_slice(frontier));
+    }
+    return num_rounds;
+  }
+
+ public:
+  static constexpr NodeId NONE = std::numeric_limits<NodeId>::max();
+
+  DCore() = delete;
+  DCore(const Graph &G, NodeId _l)
+      : in_adj(G, CoreMode::in), out_adj(G, CoreMode::out), l(_l), bag(G.n) {
+    size_t n = G.n;
+    frontier = sequence<NodeId>::uninitialized(n);
+    in_deg = sequence<NodeId>::uninitialized(n);
+    out_deg = sequence<NodeId>::uninitialized(n);
+    dcoreness = sequence<NodeId>::uninitialized(n);
+    alive = sequence<bool>::uninitialized(n);
+  }
+
+  NodeId out_bound() const { return l; }
+
+  sequence<NodeId> kcore() {
+    size_t n = in_adj.num_vertices();
+    parallel_for(0, n, [&](size_t i) {
+      in_deg[i] = in_adj.degree(i);
+      out_deg[i] = out_adj.degree(i);
+      alive[i] = true;
+    });
+
+    // vertices outside the (0, l)-D-core
+    parallel_for(0, n, [&](size_t i) {
+      if (out_deg[i] < l) {
+        bag.insert(i);
+      }
+    });
+    size_t num_rho = peel(0, NONE, false);
+    auto remaining_vertices = parlay::filter(
+        iota<NodeId>(n), [&](NodeId v) { return (bool)alive[v]; });
+
+    NodeId max_core = 0;
+    for (NodeId k = 0; remaining_vertices.size() > 0; k++) {
+      k = std::max(k, reduce(delayed_seq<NodeId>(remaining_vertices.size(),
+                                                 [&](size_t i) {
+                                                   return in_deg
+                                                       [remaining_vertices[i]];
+                                                 }),
+                             minm<NodeId>()));
+      max_core = k;
+      parallel_for(0, remaining_vertices.size(), [&](size_t i) {
+        NodeId v = remaining_vertices[i];
+        if (in_deg[v] <= k) {
+          bag.insert(v);
+        }
+      });
+      num_rho += peel(k, k, true);
+      remaining_vertices = parlay::filter(remaining_vertices,
+                                          [&](NodeId v) { return alive[v]; });
+    }
+    printf("coreness: %u\n", max_core);
+    cout << "rho: " << num_rho << endl;
+    return dcoreness;
+  }
+};
+
+#endif  // DCORE_H
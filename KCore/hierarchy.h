@@ -0,0 +1,209 @@
+#ifndef HIERARCHY_H
+#define HIERARCHY_H
+
+#include <fstream>
+#include <limits>
+
+#include "graph.h"
+#include "hashbag.h"
+#include "parlay/parallel.h"
+#include "parlay/primitives.h"
+#include "parlay/sequence.h"
+#include "utils.h"
+
+using namespace std;
+using namespace parlay;
+
+// The k-core hierarchy: a forest whose nodes are the connected components of
+// the k-cores. A node (C, k) is created for every component C of the k-core
+// that contains at least one vertex of coreness exactly k; any other component
+// of the k-core equals a component of a higher core and is not repeated. The
+// parent of a node is the smallest enclosing component at a lower k.
+//
+// The forest is built from the coreness values by a concurrent union-find that
+// adds vertices in decreasing coreness, one coreness level at a time. Nodes are
+// numbered in creation order, so a child always has a smaller id than its
+// parent.
+template <class Graph>
+class CoreHierarchy {
+  using NodeId = typename Graph::NodeId;
+  using EdgeId = typename Graph::EdgeId;
+
+  const Graph &G;
+  sequence<NodeId> uf;
+  sequence<NodeId> root_node;
+  sequence<NodeId> new_stamp;
+  sequence<NodeId> child_stamp;
+  hashbag<NodeId> new_roots_bag;
+  hashbag<NodeId> children_bag;
+
+  NodeId find(NodeId u) {
+    while (true) {
+      NodeId p = uf[u];
+      if (p == u) {
+        return u;
+      }
+      // path halving
+      NodeId gp = uf[p];
+      if (p != gp) {
+        compare_and_swap(&uf[u], p, gp);
+      }
+      u = p;
+    }
+  }
+
+  void unite(NodeId u, NodeId v) {
+    while (true) {
+      u = find(u);
+      v = find(v);
+      if (u == v) {
+        return;
+      }
+      // always link the larger root under the smaller one
+      if (u < v) {
+        std::swap(u, v);
+      }
+      if (atomic_compare_and_swap(&uf[u], u, v)) {
+        return;
+      }
+    }
+  }
+
+  // inserts r into bag the first time it is seen in level l
+  void mark(sequence<NodeId> &stamp, hashbag<NodeId> &bag, NodeId r,
+            NodeId l) {
+    NodeId old = stamp[r];
+    if (old != l && atomic_compare_and_swap(&stamp[r], old, l)) {
+      bag.insert(r);
+    }
+  }
+
+ public:
+  static constexpr NodeId NONE = std::numeric_limits<NodeId>::max();
+
+  size_t num_nodes;
+  sequence<NodeId> parent;
+  sequence<NodeId> k;
+  sequence<NodeId> size;
+  // the node created for each vertex at the level of its coreness
+  sequence<NodeId> vertex_node;
+
+  CoreHierarchy() = delete;
+  CoreHierarchy(const Graph &_G)
+      : G(_G), new_roots_bag(G.n), children_bag(G.n) {
+    size_t n = G.n;
+    uf = sequence<NodeId>::uninitialized(n);
+    root_node = sequence<NodeId>::uninitialized(n);
+    new_stamp = sequence<NodeId>::uninitialized(n);
+    child_stamp = sequence<NodeId>::uninitialized(n);
+    vertex_node = sequence<NodeId>::uninitialized(n);
+  }
+
+  template <class Core>
+  void build(const sequence<Core> &coreness) {
+    size_t n = G.n;
+    parallel_for(0, n, [&](size_t i) {
+      uf[i] = i;
+      new_stamp[i] = NONE;
+      child_stamp[i] = NONE;
+    });
+    parent = sequence<NodeId>::uninitialized(n);
+    k = sequence<NodeId>::uninitialized(n);
+    size = sequence<NodeId>::uninitialized(n);
+    num_nodes = 0;
+
+    // vertices in decreasing coreness, split into one level per coreness
+    NodeId max_core = reduce(coreness, maxm<Core>());
+    auto order = tabulate(n, [&](size_t i) { return (NodeId)i; });
+    integer_sort_inplace(make_slice(order),
+                         [&](NodeId v) { return max_core - coreness[v]; });
+    auto level_starts = pack_index<size_t>(delayed_seq<bool>(n, [&](size_t i) {
+      return i == 0 || coreness[order[i]] != coreness[order[i - 1]];
+    }));
+
+    for (size_t l = 0; l < level_starts.size(); l++) {
+      auto vs = order.cut(level_starts[l], l + 1 == level_starts.size()
+                                               ? n
+                                               : level_starts[l + 1]);
+      NodeId cur_k = coreness[vs[0]];
+      // components of higher cores touched by this level become children
+      parallel_for(0, vs.size(), [&](size_t i) {
+        NodeId u = vs[i];
+        parallel_for(G.offsets[u], G.offsets[u + 1], [&](size_t es) {
+          NodeId v = G.edges[es].v;
+          if (coreness[v] > cur_k) {
+            mark(child_stamp, children_bag, find(v), l);
+          }
+        });
+      });
+      auto children = children_bag.pack();
+      auto child_nodes = tabulate(children.size(), [&](size_t i) {
+        return root_node[children[i]];
+      });
+
+      parallel_for(0, vs.size(), [&](size_t i) {
+        NodeId u = vs[i];
+        parallel_for(G.offsets[u], G.offsets[u + 1], [&](size_t es) {
+          NodeId v = G.edges[es].v;
+          if (coreness[v] >= cur_k) {
+            unite(u, v);
+          }
+        });
+      });
+
+      parallel_for(0, vs.size(),
+                   [&](size_t i) { mark(new_stamp, new_roots_bag, find(vs[i]), l); });
+      auto new_roots = new_roots_bag.pack();
+      parallel_for(0, new_roots.size(), [&](size_t i) {
+        NodeId id = num_nodes + i;
+        root_node[new_roots[i]] = id;
+        parent[id] = NONE;
+        k[id] = cur_k;
+      });
+      parallel_for(0, vs.size(),
+                   [&](size_t i) { vertex_node[vs[i]] = root_node[find(vs[i])]; });
+      parallel_for(0, children.size(), [&](size_t i) {
+        parent[child_nodes[i]] = root_node[find(children[i])];
+      });
+
+      // size = vertices added at this level + sizes of the merged children
+      auto contributions = tabulate(vs.size() + children.size(), [&](size_t i) {
+        if (i < vs.size()) {
+          return make_pair(size_t(vertex_node[vs[i]] - num_nodes), size_t(1));
+        }
+        NodeId child = child_nodes[i - vs.size()];
+        return make_pair(size_t(parent[child] - num_nodes), size_t(size[child]));
+      });
+      auto sizes = reduce_by_index(contributions, new_roots.size());
+      parallel_for(0, new_roots.size(),
+                   [&](size_t i) { size[num_nodes + i] = sizes[i]; });
+      num_nodes += new_roots.size();
+    }
+    parent.resize(num_nodes);
+    k.resize(num_nodes);
+    size.resize(num_nodes);
+  }
+
+  // Binary layout: num_nodes and n as uint64, followed by parent, k and size
+  // (num_nodes entries each, roots have parent NONE) and vertex_node (n
+  // entries), all as NodeId.
+  void write(char const *filename) {
+    std::ofstream ofs(filename);
+    if (!ofs.is_open()) {
+      std::cerr << "Error: Cannot open file " << filename << std::endl;
+      abort();
+    }
+    uint64_t header[2] = {num_nodes, G.n};
+    ofs.write(reinterpret_cast<char *>(header), sizeof(header));
+    ofs.write(reinterpret_cast<char *>(parent.begin()),
+              sizeof(NodeId) * num_nodes);
+    ofs.write(reinterpret_cast<char *>(k.begin()), sizeof(NodeId) * num_nodes);
+    ofs.write(reinterpret_cast<char *>(size.begin()),
+              sizeof(NodeId) * num_nodes);
+    ofs.write(reinterpret_cast<char *>(vertex_node.begin()),
+              sizeof(NodeId) * G.n);
+    ofs.close();
+  }
+};
+
+#endif  // HIERARCHY_H
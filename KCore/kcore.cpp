@@ -1,107 +1,243 @@
 #include "kcore.h"
 
+#include <fcntl.h>
+#include <getopt.h>
+#include <sys/resource.h>
+#include <unistd.h>
+
 #include <algorithm>
+#include <cstring>
 #include <queue>
 #include <vector>
 
+#include "batch.h"
+#include "dcore.h"
 #include "graph.h"
+#include "hierarchy.h"
+#include "numa_policy.h"
 #include "parlay/internal/get_time.h"
 #include "parlay/sequence.h"
 #include "utils.h"
+#include "wkcore.h"
 
 using namespace std;
 using namespace parlay;
 
 constexpr int NUM_ROUND = 5;
+// set by -N, reports local and remote node loads of the timed rounds
+bool report_remote_accesses = false;
+// set by -1, vertex ids in edge lists start at 1
+bool one_based_ids = false;
 
-template <class Graph, class NodeId = typename Graph::NodeId>
-void pal_verifier(const Graph &G, const sequence<NodeId> &act_core) {
-  size_t n = G.n;
-  size_t num_buckets = 16;
-  auto buckets = sequence<hashbag<NodeId>>(num_buckets, hashbag<NodeId>(n));
+// Checks a coreness against the local certificate of the core decomposition
+// in O(m) work instead of recomputing it. With S_k the vertices of claimed
+// coreness at least k, every vertex v with claimed coreness c must satisfy
+//   support: v has at least c neighbors in S_c, so S_c has min degree c and
+//            c is not too high;
+//   h-index: v has at most c neighbors in S_{c+1};
+//   peeling: v is peeled when the vertices of claimed coreness c are
+//            repeatedly removed from S_c while their degree is at most c,
+//            i.e. v is not in the (c+1)-core, so c is not too low.
+// The local conditions alone also hold below the coreness (a triangle labeled
+// 1 passes both), which the peeling check rules out. Peeling level c only
+// decrements neighbors of claimed coreness c, so all levels are peeled at once.
+template <class Graph, class Core>
+void certificate_verifier(const Adjacency<Graph> &adj,
+                          const sequence<Core> &act_core) {
+  using NodeId = typename Graph::NodeId;
+  constexpr uint32_t local_queue_size = 128;
+  constexpr size_t BLOCK_SIZE = 128;
+  constexpr size_t num_samples = 10;
+  internal::timer t;
+  size_t n = adj.num_vertices();
+  auto support = tabulate(n, [&](NodeId u) {
+    return adj.count(u, [&](NodeId v) { return act_core[v] >= act_core[u]; });
+  });
+  auto higher = tabulate(n, [&](NodeId u) {
+    return adj.count(u, [&](NodeId v) { return act_core[v] > act_core[u]; });
+  });
+  auto bad_support = pack_index<NodeId>(delayed_seq<bool>(
+      n, [&](size_t i) { return support[i] < act_core[i]; }));
+  auto bad_hindex = pack_index<NodeId>(
+      delayed_seq<bool>(n, [&](size_t i) { return higher[i] > act_core[i]; }));
+
+  // support becomes the degree within S_c of the vertices not yet peeled
+  hashbag<NodeId> bag(n);
   auto frontier = sequence<NodeId>::uninitialized(n);
-  auto exp_core = sequence<NodeId>::uninitialized(n);
-  parallel_for(
-      0, n, [&](size_t i) { exp_core[i] = G.offsets[i + 1] - G.offsets[i]; });
-  NodeId max_deg = reduce(make_slice(exp_core), maxm<NodeId>());
-  NodeId max_core = 0;
-
-  for (NodeId k = 0; k <= max_deg; k += num_buckets) {
-    max_deg = 0;
-    parallel_for(0, n, [&](size_t i) {
-      write_max(&max_deg, exp_core[i]);
-      if (exp_core[i] >= k && exp_core[i] < k + num_buckets) {
-        buckets[exp_core[i] - k].insert(i);
-      }
-    });
-    if (max_deg < k) {
-      break;
-    }
-    for (NodeId i = 0; i < num_buckets; i++) {
-      auto size = buckets[i].pack_into(make_slice(frontier));
-      while (size) {
-        parallel_for(0, size, [&](size_t j) {
-          auto u = frontier[j];
-          if (exp_core[u] == k + i) {
-            write_max(&max_core, k + i);
-            parallel_for(G.offsets[u], G.offsets[u + 1], [&](size_t es) {
-              auto v = G.edges[es].v;
-              if (exp_core[v] > k + i) {
-                auto [id, succeed] =
-                    fetch_and_add_bounded(&exp_core[v], -1, k + i);
-                id--;
-                if (succeed && id + 1 > k + i && id < k + num_buckets) {
-                  buckets[id - k].insert(v);
-                }
-              }
-            });
+  sequence<bool> alive(n, true);
+  parallel_for(0, n, [&](size_t i) {
+    if (support[i] <= act_core[i]) {
+      bag.insert(i);
+    }
+  });
+  auto size = bag.pack_into(make_slice(frontier));
+  while (size) {
+    parallel_for(
+        0, size,
+        [&](size_t j) {
+          NodeId local_queue[local_queue_size];
+          size_t front = 0, rear = 0;
+          local_queue[rear++] = frontier[j];
+          while (front < rear) {
+            NodeId u = local_queue[front++];
+            if (!atomic_compare_and_swap(&alive[u], true, false)) {
+              continue;
+            }
+            NodeId k = act_core[u];
+            bool sequential = adj.peel_size(u) < BLOCK_SIZE;
+            adj.map_peel(
+                u,
+                [&](NodeId v) {
+                  if (act_core[v] == k && alive[v] && support[v] > k) {
+                    auto [id, succeed] =
+                        fetch_and_add_bounded(&support[v], -1, k);
+                    if (succeed && id == k + 1) {
+                      if (sequential && rear < local_queue_size) {
+                        local_queue[rear++] = v;
+                      } else {
+                        bag.insert(v);
+                      }
+                    }
+                  }
+                },
+                !sequential);
           }
-        });
-        size = buckets[i].pack_into(make_slice(frontier));
+        },
+        1);
+    size = bag.pack_into(make_slice(frontier));
+  }
+  auto bad_peeling = pack_index<NodeId>(alive);
+  t.stop();
+  printf("Certificate check time: %f\n", t.total_time());
+
+  auto report = [&](const char *name, const sequence<NodeId> &offenders) {
+    printf("%s violations: %zu\n", name, offenders.size());
+    for (size_t i = 0; i < min(offenders.size(), num_samples); i++) {
+      NodeId v = offenders[i];
+      printf("  vertex %u: coreness %u, degree %u\n", v, (NodeId)act_core[v],
+             adj.degree(v));
+    }
+  };
+  report("Support", bad_support);
+  report("H-index", bad_hindex);
+  report("Peeling", bad_peeling);
+  assert(bad_support.empty() && bad_hindex.empty() && bad_peeling.empty());
+}
+
+template <class Graph, class Strength>
+void weighted_verifier(const Graph &G, const sequence<Strength> &act_core) {
+  using NodeId = typename Graph::NodeId;
+  size_t n = G.n;
+  sequence<Strength> exp_core(n);
+  sequence<Strength> strength(n);
+  sequence<bool> alive(n, true);
+  priority_queue<pair<Strength, NodeId>, vector<pair<Strength, NodeId>>,
+                 greater<pair<Strength, NodeId>>>
+      pq;
+  for (size_t i = 0; i < n; i++) {
+    strength[i] = 0;
+    for (size_t j = G.offsets[i]; j < G.offsets[i + 1]; j++) {
+      strength[i] += G.edges[j].w;
+    }
+    pq.emplace(strength[i], i);
+  }
+  Strength cur = 0;
+  while (!pq.empty()) {
+    auto [s, u] = pq.top();
+    pq.pop();
+    if (!alive[u] || s != strength[u]) {
+      continue;
+    }
+    alive[u] = false;
+    cur = max(cur, s);
+    exp_core[u] = cur;
+    for (size_t j = G.offsets[u]; j < G.offsets[u + 1]; j++) {
+      NodeId v = G.edges[j].v;
+      if (alive[v]) {
+        strength[v] -= G.edges[j].w;
+        pq.emplace(strength[v], v);
       }
     }
   }
   for (size_t i = 0; i < n; i++) {
-    if (exp_core[i] != act_core[i]) {
-      printf("exp_core[%zu]: %u while act_core[%zu]: %u\n", i, exp_core[i], i,
-             act_core[i]);
+    // floating-point strengths are summed in a different order
+    bool match = is_integral_v<Strength>
+                     ? exp_core[i] == act_core[i]
+                     : fabs((double)exp_core[i] - act_core[i]) <=
+                           1e-6 * max(1.0, fabs((double)exp_core[i]));
+    if (!match) {
+      cout << "exp_core[" << i << "]: " << exp_core[i] << " while act_core["
+           << i << "]: " << act_core[i] << endl;
     }
-    assert(exp_core[i] == act_core[i]);
+    assert(match);
   }
 }
 
 template <class Graph, class NodeId = typename Graph::NodeId>
-void verifier(const Graph &G, const sequence<NodeId> &act_core) {
-  internal::timer t;
+void dcore_verifier(const Graph &G, NodeId l,
+                    const sequence<NodeId> &act_core) {
   size_t n = G.n;
-  sequence<NodeId> exp_core(n);
+  Adjacency in_adj(G, CoreMode::in), out_adj(G, CoreMode::out);
+  sequence<NodeId> in_deg(n), out_deg(n);
+  sequence<NodeId> exp_core(n, DCore<Graph>::NONE);
+  sequence<bool> alive(n, true);
   sequence<sequence<NodeId>> buckets(n + 1);
+  NodeId k = 0;
+  vector<NodeId> stack;
+  auto remove = [&](NodeId s, NodeId value) {
+    stack.push_back(s);
+    while (!stack.empty()) {
+      NodeId u = stack.back();
+      stack.pop_back();
+      if (!alive[u]) {
+        continue;
+      }
+      alive[u] = false;
+      exp_core[u] = value;
+      in_adj.map_peel(
+          u,
+          [&](NodeId v) {
+            if (alive[v] && in_deg[v] > k) {
+              in_deg[v]--;
+              buckets[in_deg[v]].push_back(v);
+            }
+          },
+          false);
+      out_adj.map_peel(
+          u,
+          [&](NodeId v) {
+            if (alive[v] && out_deg[v] >= l) {
+              out_deg[v]--;
+              if (out_deg[v] < l) {
+                stack.push_back(v);
+              }
+            }
+          },
+          false);
+    }
+  };
   for (size_t i = 0; i < n; i++) {
-    exp_core[i] = G.offsets[i + 1] - G.offsets[i];
-    buckets[exp_core[i]].push_back(i);
-  }
-  NodeId max_core = 0;
-  for (NodeId i = 1; i <= n; i++) {
-    for (size_t _ = 0; _ < buckets[i].size(); _++) {
-      auto u = buckets[i][_];
-      if (exp_core[u] == i) {
-        max_core = max(max_core, i);
-        for (size_t j = G.offsets[u]; j < G.offsets[u + 1]; j++) {
-          NodeId v = G.edges[j].v;
-          if (exp_core[v] > i) {
-            exp_core[v]--;
-            buckets[exp_core[v]].push_back(v);
-          }
-        }
+    in_deg[i] = in_adj.degree(i);
+    out_deg[i] = out_adj.degree(i);
+  }
+  for (size_t i = 0; i < n; i++) {
+    if (out_deg[i] < l) {
+      remove(i, DCore<Graph>::NONE);
+    }
+  }
+  for (size_t i = 0; i < n; i++) {
+    if (alive[i]) {
+      buckets[in_deg[i]].push_back(i);
+    }
+  }
+  for (k = 0; k <= n; k++) {
+    for (size_t _ = 0; _ < buckets[k].size(); _++) {
+      NodeId u = buckets[k][_];
+      if (alive[u] && in_deg[u] == k) {
+        remove(u, k);
       }
     }
   }
-  t.stop();
-  printf("Sequential KCore running time: %f\n", t.total_time());
-  ofstream ofs("kcore.tsv", ios_base::app);
-  ofs << t.total_time() << '\t';
-  ofs.close();
-
   for (size_t i = 0; i < n; i++) {
     if (exp_core[i] != act_core[i]) {
       printf("exp_core[%zu]: %u while act_core[%zu]: %u\n", i, exp_core[i], i,
@@ -111,15 +247,160 @@ void verifier(const Graph &G, const sequence<NodeId> &act_core) {
   }
 }
 
+// the checks below run on 32-bit coreness, so that they are compiled once
+// whatever the width of the solver's counters
+template <class Core>
+sequence<uint32_t> widen(const sequence<Core> &coreness) {
+  return map(coreness, [](Core c) { return (uint32_t)c; });
+}
+
+template <class Graph, class Core>
+void verify_coreness(const KCore<Graph, Core> &algo, const Graph &,
+                     const sequence<Core> &coreness) {
+  if constexpr (is_same_v<Core, typename Graph::NodeId>) {
+    certificate_verifier(algo.adjacency(), coreness);
+  } else {
+    certificate_verifier(algo.adjacency(), widen(coreness));
+  }
+}
+
+template <class Graph, class NodeId = typename Graph::NodeId>
+void verify_coreness(const DCore<Graph> &algo, const Graph &G,
+                     const sequence<NodeId> &coreness) {
+  dcore_verifier(G, algo.out_bound(), coreness);
+}
+
+// the members of a batch are checked together as their disjoint union
+void verify_coreness(const BatchKCore &, const GraphBatch &B,
+                     const sequence<GraphBatch::NodeId> &coreness) {
+  auto G = B.disjoint_union();
+  certificate_verifier(Adjacency(G), coreness);
+}
+
+template <class Graph, class Strength>
+void verify_coreness(const WeightedKCore<Graph> &, const Graph &G,
+                     const sequence<Strength> &coreness) {
+  weighted_verifier(G, coreness);
+}
+
+template <class NodeId>
+void report_approx_error(const sequence<NodeId> &exp_core,
+                         const sequence<NodeId> &act_core) {
+  size_t n = exp_core.size();
+  auto rel_error = delayed_seq<double>(n, [&](size_t i) {
+    if (exp_core[i] == 0) {
+      return act_core[i] == 0 ? 0.0 : 1.0;
+    }
+    return fabs((double)act_core[i] - exp_core[i]) / exp_core[i];
+  });
+  size_t num_exact =
+      count_if(iota(n), [&](size_t i) { return exp_core[i] == act_core[i]; });
+  printf("Max relative error: %f\n", reduce(rel_error, maxm<double>()));
+  printf("Average relative error: %f\n", reduce(rel_error) / n);
+  printf("Exact coreness: %zu/%zu\n", num_exact, n);
+}
+
+void report_node_loads(const RemoteAccessCounters &counters,
+                       pair<uint64_t, uint64_t> start) {
+  if (!counters.available()) {
+    printf("Node loads: unavailable (%s)\n",
+           counters.unavailable_reason().c_str());
+    return;
+  }
+  auto [loads, remote] = counters.read_counts();
+  loads -= start.first;
+  remote -= start.second;
+  printf("Node loads per round: %.0f, remote: %.0f (%.2f%%)\n",
+         (double)loads / NUM_ROUND, (double)remote / NUM_ROUND,
+         loads ? 100.0 * remote / loads : 0.0);
+}
+
+// Start/stop hook for perf stat --control fifo:ctl,ack -D -1: if the
+// environment names the two fifos in KCORE_PERF_CTL and KCORE_PERF_ACK, perf
+// counts only between enable() and disable(), i.e. the timed rounds
+class PerfControl {
+  int ctl = -1;
+  int ack = -1;
+
+  void send(const char *command) {
+    if (ctl < 0) {
+      return;
+    }
+    char reply[8];
+    if (write(ctl, command, strlen(command)) < 0 ||
+        read(ack, reply, sizeof(reply)) <= 0) {
+      cerr << "Error: No reply from perf to " << command << endl;
+      abort();
+    }
+  }
+
+ public:
+  PerfControl() {
+    char const *ctl_path = getenv("KCORE_PERF_CTL");
+    char const *ack_path = getenv("KCORE_PERF_ACK");
+    if (!ctl_path || !ack_path) {
+      return;
+    }
+    // O_RDWR does not wait for perf to open its end
+    ctl = open(ctl_path, O_RDWR);
+    ack = open(ack_path, O_RDWR);
+    if (ctl < 0 || ack < 0) {
+      cerr << "Error: Cannot open the perf control fifos" << endl;
+      abort();
+    }
+  }
+
+  ~PerfControl() {
+    if (ctl >= 0) {
+      close(ctl);
+      close(ack);
+    }
+  }
+
+  void enable() { send("enable\n"); }
+  void disable() { send("disable\n"); }
+};
+
 template <class Algo, class Graph>
-void run(Algo &algo, const Graph &G, bool verify) {
+auto run(Algo &algo, const Graph &G, bool verify, double eps = 0,
+         bool resume = false) {
   double total_time = 0;
-  using NodeId = typename Graph::NodeId;
-  sequence<NodeId> coreness;
-  for (int i = 0; i <= NUM_ROUND; i++) {
+  decltype(algo.kcore()) coreness;
+  unique_ptr<RemoteAccessCounters> counters;
+  pair<uint64_t, uint64_t> start_counts;
+  PerfControl perf;
+  if (report_remote_accesses) {
+    counters = make_unique<RemoteAccessCounters>();
+  }
+  if (resume) {
+    // a single round that picks up the checkpoint
+    perf.enable();
     internal::timer t;
     coreness = algo.kcore();
     t.stop();
+    perf.disable();
+    printf("Resumed Round: %f\n", t.total_time());
+    if (verify) {
+      printf("Running verifier...\n");
+      verify_coreness(algo, G, coreness);
+    }
+    printf("\n");
+    return coreness;
+  }
+  for (int i = 0; i <= NUM_ROUND; i++) {
+    if (i == 1) {
+      if (counters) {
+        start_counts = counters->read_counts();
+      }
+      perf.enable();
+    }
+    internal::timer t;
+    if constexpr (requires { algo.approx_kcore(eps); }) {
+      coreness = eps > 0 ? algo.approx_kcore(eps) : algo.kcore();
+    } else {
+      coreness = algo.kcore();
+    }
+    t.stop();
     if (i == 0) {
       printf("Warmup Round: %f\n", t.total_time());
     } else {
@@ -127,32 +408,250 @@ void run(Algo &algo, const Graph &G, bool verify) {
       total_time += t.total_time();
     }
   }
+  perf.disable();
   double average_time = total_time / NUM_ROUND;
   printf("Average time: %f\n", average_time);
+  if (counters) {
+    report_node_loads(*counters, start_counts);
+  }
   // printf("Max coreness: %u\n", reduce(coreness, maxm<NodeId>()));
 
-  if (verify) {
+  if (verify && eps > 0) {
+    printf("Running exact decomposition...\n");
+    report_approx_error(algo.kcore(), coreness);
+  } else if (verify) {
     printf("Running verifier...\n");
-    internal::timer t;
-    auto coreness = algo.kcore();
-    t.stop();
-    pal_verifier(G, coreness);
+    verify_coreness(algo, G, coreness);
   }
 
   ofstream ofs("kcore.tsv", ios_base::app);
   ofs << average_time << '\n';
   ofs.close();
   printf("\n");
+  return coreness;
+}
+
+template <class Graph, class Core>
+void build_hierarchy(const Graph &G, const sequence<Core> &coreness,
+                     char const *output_path) {
+  CoreHierarchy hierarchy(G);
+  internal::timer t;
+  if constexpr (is_same_v<Core, typename Graph::NodeId>) {
+    hierarchy.build(coreness);
+  } else {
+    hierarchy.build(widen(coreness));
+  }
+  t.stop();
+  printf("Hierarchy: %zu nodes, %zu roots\n", hierarchy.num_nodes,
+         count(hierarchy.parent, CoreHierarchy<Graph>::NONE));
+  printf("Hierarchy time: %f\n", t.total_time());
+  hierarchy.write(output_path);
+}
+
+template <class Algo, class Graph, class Core>
+void write_degeneracy_order(const Algo &algo, const Graph &G,
+                            const sequence<Core> &coreness,
+                            const string &output_prefix) {
+  using NodeId = typename Graph::NodeId;
+  internal::timer t;
+  auto order = algo.degeneracy_order();
+  auto sub_rounds = algo.peel_sub_rounds();
+  auto DG = algo.acyclic_orientation();
+  t.stop();
+  printf("Degeneracy order time: %f\n", t.total_time());
+
+  // n as uint64, followed by the order, then k and the sub-round within k of
+  // every vertex, all as NodeId whatever the width of the coreness
+  string order_path = output_prefix + ".order";
+  ofstream ofs(order_path);
+  if (!ofs.is_open()) {
+    cerr << "Error: Cannot open file " << order_path << endl;
+    abort();
+  }
+  uint64_t n = G.n;
+  ofs.write(reinterpret_cast<char *>(&n), sizeof(uint64_t));
+  ofs.write(reinterpret_cast<const char *>(order.begin()), sizeof(NodeId) * n);
+  auto k = tabulate(n, [&](size_t i) { return (NodeId)coreness[i]; });
+  ofs.write(reinterpret_cast<char *>(k.begin()), sizeof(NodeId) * n);
+  ofs.write(reinterpret_cast<char *>(sub_rounds.begin()), sizeof(NodeId) * n);
+  ofs.close();
+  DG.write_binary_format((output_prefix + ".orient.bin").c_str());
+}
+
+// n and the bytes per value as two uint64, followed by the coreness of every
+// vertex in the width the solver used
+template <class Core>
+void write_coreness(const sequence<Core> &coreness, char const *output_path) {
+  ofstream ofs(output_path);
+  if (!ofs.is_open()) {
+    cerr << "Error: Cannot open file " << output_path << endl;
+    abort();
+  }
+  uint64_t header[2] = {coreness.size(), sizeof(Core)};
+  ofs.write(reinterpret_cast<char *>(header), sizeof(header));
+  ofs.write(reinterpret_cast<const char *>(coreness.begin()),
+            sizeof(Core) * coreness.size());
+  ofs.close();
+  printf("Wrote coreness to %s: %zu bytes per vertex\n", output_path,
+         sizeof(Core));
+}
+
+template <class Graph>
+Graph load_graph(char const *input_path, bool symmetrized,
+                 bool directed = false) {
+  printf("Reading graph...\n");
+  Graph G;
+  if (is_edge_list(input_path)) {
+    // unweighted edge lists are symmetrized while they are read
+    internal::timer t;
+    G.read_edge_list(input_path,
+                     is_same_v<typename Graph::EdgeTy, Empty> && !directed,
+                     one_based_ids);
+    t.stop();
+    rusage usage;
+    getrusage(RUSAGE_SELF, &usage);
+    printf("Read edge list: %f s, peak memory %.1f MB\n", t.total_time(),
+           usage.ru_maxrss / 1024.0);
+  } else {
+    G.read_graph(input_path);
+  }
+  if constexpr (!is_same_v<typename Graph::EdgeTy, Empty>) {
+    if (!G.weighted) {
+      printf("No edge weights in input, generating weights in [1, 100]\n");
+      G.generate_random_weight(1, 100);
+    }
+  }
+  if (directed) {
+    // in-edges are built instead of a symmetrized copy
+    G.sort_neighbors();
+    G.make_inverse();
+    G.symmetrized = false;
+  } else {
+    if (!symmetrized && !G.symmetrized) {
+      G = make_symmetrized(G);
+    }
+    G.symmetrized = true;
+  }
+
+  printf("Running on %s: |V|=%zu, |E|=%zu, num_round=%d\n", input_path, G.n,
+         G.m, NUM_ROUND);
+  return G;
+}
+
+template <class EdgeTy>
+void run_weighted(char const *input_path, bool symmetrized, bool verify) {
+  auto G = load_graph<Graph<uint32_t, uint64_t, EdgeTy>>(input_path,
+                                                         symmetrized);
+  WeightedKCore solver(G);
+  run(solver, G, verify);
+}
+
+struct CheckpointOptions {
+  char const *path = nullptr;
+  double interval = 0;
+  bool resume = false;
+};
+
+template <class Graph, class Core>
+void set_checkpoint(KCore<Graph, Core> &solver,
+                    const CheckpointOptions &checkpoint) {
+  if (checkpoint.path) {
+    solver.set_checkpoint(checkpoint.path, checkpoint.interval);
+    if (checkpoint.resume) {
+      solver.resume_from_checkpoint();
+    }
+  }
+}
+
+// for the exact decomposition of a symmetric graph, the degree counters and
+// the coreness use the narrowest type that holds the max degree, which shrinks
+// the array every peeling step updates; otherwise they are 32-bit
+template <class Graph, class F>
+void with_solver(const Graph &G, bool exact, F f) {
+  if (!exact) {
+    KCore<Graph> solver(G);
+    f(solver);
+    return;
+  }
+  size_t max_degree = max_degree_bound(G, CoreMode::symmetric);
+  with_core_type(max_degree, [&](auto core) {
+    using Core = typename decltype(core)::type;
+    printf("Coreness counters: %zu bits (max degree %zu)\n", sizeof(Core) * 8,
+           max_degree);
+    KCore<Graph, Core> solver(G);
+    f(solver);
+  });
+}
+
+void run_directed(char const *input_path, CoreMode mode, uint32_t l,
+                  bool verify, double eps, const CheckpointOptions &checkpoint,
+                  NumaPolicy numa_policy, char const *coreness_path) {
+  auto G = load_graph<Graph<>>(input_path, false, true);
+  if (l > 0) {
+    DCore solver(G, l);
+    auto coreness = run(solver, G, verify);
+    if (coreness_path) {
+      write_coreness(coreness, coreness_path);
+    }
+    return;
+  }
+  KCore solver(G, mode);
+  solver.place(numa_policy);
+  set_checkpoint(solver, checkpoint);
+  auto coreness = run(solver, G, verify, eps, checkpoint.resume);
+  if (coreness_path) {
+    write_coreness(coreness, coreness_path);
+  }
+}
+
+void run_batch(char const *input_path, bool verify,
+               char const *coreness_path) {
+  printf("Reading batch...\n");
+  GraphBatch B;
+  B.read(input_path);
+  BatchKCore solver(B);
+  printf("Running on %s: %zu graphs (%zu large), |V|=%zu, |E|=%zu, "
+         "num_round=%d\n",
+         input_path, B.num_graphs, solver.num_large(), B.n, B.m, NUM_ROUND);
+  auto coreness = run(solver, B, verify);
+  if (coreness_path) {
+    write_coreness(coreness, coreness_path);
+  }
 }
 
 int main(int argc, char *argv[]) {
   if (argc == 1) {
     fprintf(stderr,
-            "Usage: %s [-i input_file] [-s] [-v]\n"
+            "Usage: %s [-i input_file] [-s] [-v] [-H hierarchy_file] "
+            "[-d order_prefix] [-e eps] [-w] [-f] [-D mode] [-l l]\n"
+            "       [-o coreness_file] [-1] [-N numa_policy] [--checkpoint file] "
+            "[--checkpoint-interval seconds] [--resume]\n"
             "Options:\n"
-            "\t-i,\tinput file path\n"
+            "\t-i,\tinput file path (.adj, .bin, .txt/.el edge list, or "
+            ".batch of many small graphs)\n"
+            "\t-1,\tvertex ids in the edge list start at 1\n"
             "\t-s,\tsymmetrized input graph\n"
-            "\t-v,\tverify result\n",
+            "\t-v,\tverify result (with -e, report the error against an "
+            "exact run)\n"
+            "\t-H,\twrite the k-core hierarchy to hierarchy_file\n"
+            "\t-d,\twrite the degeneracy order to order_prefix.order and the "
+            "acyclic orientation to order_prefix.orient.bin\n"
+            "\t-e,\tcompute (1+eps)-approximate coreness\n"
+            "\t-w,\tcompute weighted s-cores from the edge weights (random "
+            "weights if the input has none)\n"
+            "\t-f,\tuse floating-point edge weights with -w\n"
+            "\t-D,\tdirected cores without symmetrizing: in, out, or "
+            "undirected (union of out- and in-neighbors)\n"
+            "\t-l,\twith -D in, compute (k,l)-D-cores for this l\n"
+            "\t-o,\twrite the coreness to coreness_file, in the narrowest "
+            "width that holds the max degree\n"
+            "\t-N,\tNUMA placement: none, interleave, blocked or replicate; "
+            "also reports remote node loads\n"
+            "\t--checkpoint,\twrite checkpoints of the exact decomposition "
+            "to file\n"
+            "\t--checkpoint-interval,\tminimum seconds between checkpoints "
+            "(default 0, at every stride)\n"
+            "\t--resume,\trun a single round from the checkpoint in file\n",
             argv[0]);
     exit(EXIT_FAILURE);
   }
@@ -160,7 +659,24 @@ int main(int argc, char *argv[]) {
   bool symmetrized = false;
   bool verify = false;
   char const *input_path = nullptr;
-  while ((c = getopt(argc, argv, "i:p:a:wsv")) != -1) {
+  char const *hierarchy_path = nullptr;
+  char const *order_prefix = nullptr;
+  char const *coreness_path = nullptr;
+  bool weighted = false;
+  bool float_weights = false;
+  char const *directed_mode = nullptr;
+  uint32_t l = 0;
+  double eps = 0;
+  CheckpointOptions checkpoint;
+  NumaPolicy numa_policy = NumaPolicy::none;
+  char const *numa_name = "none";
+  static const option long_options[] = {
+      {"checkpoint", required_argument, nullptr, 'C'},
+      {"checkpoint-interval", required_argument, nullptr, 'T'},
+      {"resume", no_argument, nullptr, 'R'},
+      {nullptr, 0, nullptr, 0}};
+  while ((c = getopt_long(argc, argv, "i:p:a:H:d:o:e:D:l:N:wfsv1", long_options,
+                          nullptr)) != -1) {
     switch (c) {
       case 'i':
         input_path = optarg;
@@ -168,24 +684,153 @@ int main(int argc, char *argv[]) {
       case 's':
         symmetrized = true;
         break;
+      case '1':
+        one_based_ids = true;
+        break;
       case 'v':
         verify = true;
         break;
+      case 'H':
+        hierarchy_path = optarg;
+        break;
+      case 'd':
+        order_prefix = optarg;
+        break;
+      case 'o':
+        coreness_path = optarg;
+        break;
+      case 'e':
+        eps = atof(optarg);
+        break;
+      case 'w':
+        weighted = true;
+        break;
+      case 'f':
+        float_weights = true;
+        break;
+      case 'D':
+        directed_mode = optarg;
+        break;
+      case 'l':
+        l = atol(optarg);
+        break;
+      case 'N':
+        if (!parse_numa_policy(optarg, numa_policy)) {
+          cerr << "Error: Unknown NUMA policy " << optarg << endl;
+          abort();
+        }
+        numa_name = optarg;
+        report_remote_accesses = true;
+        break;
+      case 'C':
+        checkpoint.path = optarg;
+        break;
+      case 'T':
+        checkpoint.interval = atof(optarg);
+        break;
+      case 'R':
+        checkpoint.resume = true;
+        break;
     }
   }
 
-  printf("Reading graph...\n");
-  Graph G;
-  G.read_graph(input_path);
-  if (!symmetrized) {
-    G = make_symmetrized(G);
+  if (checkpoint.resume && !checkpoint.path) {
+    cerr << "Error: --resume requires --checkpoint" << endl;
+    abort();
+  }
+  if (checkpoint.path && (weighted || eps > 0 || l > 0 || order_prefix)) {
+    cerr << "Error: checkpoints only support the exact decomposition without "
+            "-w, -e, -l or -d"
+         << endl;
+    abort();
   }
-  G.symmetrized = true;
 
-  printf("Running on %s: |V|=%zu, |E|=%zu, num_round=%d\n", input_path, G.n,
-         G.m, NUM_ROUND);
+  if (input_path && string(input_path).ends_with(".batch")) {
+    if (weighted || eps > 0 || directed_mode || order_prefix ||
+        hierarchy_path || checkpoint.path || numa_policy != NumaPolicy::none) {
+      cerr << "Error: batches only support -v and -o" << endl;
+      abort();
+    }
+    run_batch(input_path, verify, coreness_path);
+    return 0;
+  }
 
-  KCore solver(G);
-  run(solver, G, verify);
+  if (numa_policy != NumaPolicy::none) {
+    if (!numa_supported()) {
+      cerr << "Error: NUMA policies require libnuma (build with NUMA=1)"
+           << endl;
+      abort();
+    }
+    if (numa_policy != NumaPolicy::interleave && (weighted || l > 0)) {
+      cerr << "Error: -w and -l only support -N interleave" << endl;
+      abort();
+    }
+    printf("NUMA policy: %s on %zu nodes\n", numa_name, num_numa_nodes());
+    set_default_numa_policy(numa_policy);
+  }
+
+  if (weighted) {
+    if (eps > 0 || order_prefix || hierarchy_path || coreness_path) {
+      cerr << "Error: -w cannot be combined with -e, -d, -H or -o" << endl;
+      abort();
+    }
+    if (float_weights) {
+      run_weighted<float>(input_path, symmetrized, verify);
+    } else {
+      run_weighted<uint32_t>(input_path, symmetrized, verify);
+    }
+    return 0;
+  }
+
+  if (directed_mode) {
+    CoreMode mode;
+    if (!strcmp(directed_mode, "in")) {
+      mode = CoreMode::in;
+    } else if (!strcmp(directed_mode, "out")) {
+      mode = CoreMode::out;
+    } else if (!strcmp(directed_mode, "undirected")) {
+      mode = CoreMode::undirected;
+    } else {
+      cerr << "Error: Unknown mode " << directed_mode << " for -D" << endl;
+      abort();
+    }
+    if (order_prefix || hierarchy_path) {
+      cerr << "Error: -D cannot be combined with -d or -H" << endl;
+      abort();
+    }
+    if (l > 0 && (mode != CoreMode::in || eps > 0)) {
+      cerr << "Error: -l requires -D in and the exact decomposition" << endl;
+      abort();
+    }
+    run_directed(input_path, mode, l, verify, eps, checkpoint, numa_policy,
+                 coreness_path);
+    return 0;
+  }
+  if (l > 0) {
+    cerr << "Error: -l requires -D in" << endl;
+    abort();
+  }
+
+  auto G = load_graph<Graph<>>(input_path, symmetrized);
+  if (eps > 0 && order_prefix) {
+    cerr << "Error: -d requires the exact decomposition" << endl;
+    abort();
+  }
+
+  with_solver(G, eps == 0, [&](auto &solver) {
+    solver.place(numa_policy);
+    solver.set_record_peel_order(order_prefix != nullptr);
+    set_checkpoint(solver, checkpoint);
+    auto coreness = run(solver, G, verify, eps, checkpoint.resume);
+    if (coreness_path) {
+      write_coreness(coreness, coreness_path);
+    }
+    if (order_prefix) {
+      write_degeneracy_order(solver, G, coreness, order_prefix);
+    }
+    if (hierarchy_path) {
+      build_hierarchy(G, coreness, hierarchy_path);
+    }
+  });
   return 0;
 }
@@ -1,7 +1,16 @@
+#ifndef KCORE_H
+#define KCORE_H
+
+#include <chrono>
+#include <cstdio>
+#include <fstream>
 #include <set>
+#include <type_traits>
 
+#include "adjacency.h"
 #include "graph.h"
 #include "hashbag.h"
+#include "numa_policy.h"
 #include "parlay/parallel.h"
 #include "parlay/primitives.h"
 #include "parlay/sequence.h"
@@ -20,7 +29,11 @@ inline pair<E, bool> fetch_and_add_bounded(E *a, EV b, E k) {
   return make_pair(oldV, c);
 }
 
-template <class Graph>
+// Core is the type of the degree counters and of the coreness. It must hold
+// the largest degree, so a narrower type can be chosen for graphs of small
+// max degree, see with_core_type. Narrow types only serve the exact
+// decomposition, to keep their instantiations out of the build
+template <class Graph, class Core = typename Graph::NodeId>
 class KCore {
   using NodeId = typename Graph::NodeId;
   using EdgeId = typename Graph::EdgeId;
@@ -47,27 +60,267 @@ class KCore {
       log2_error_factor / (init_reduce_ratio * init_reduce_ratio);
 
   const Graph &G;
+  Adjacency<Graph> adj;
   sequence<hashbag<NodeId>> buckets;
   sequence<NodeId> frontier;
-  sequence<NodeId> coreness;
+  sequence<Core> coreness;
   sequence<bool> alive;
   sequence<bool> sample_mode;
   sequence<Sampler> samplers;
   hashbag<NodeId> counting_bag;
+  bool record_peel_order = false;
+  sequence<NodeId> peel_round;
+  sequence<NodeId> peel_depth;
+  sequence<NodeId> peel_ts;
+  sequence<NodeId> round_k;
+  sequence<Graph> replicas;
+  char const *checkpoint_path = nullptr;
+  double checkpoint_interval = 0;
+  bool resume_next = false;
+  std::chrono::steady_clock::time_point last_checkpoint;
+
+  static constexpr uint64_t checkpoint_magic = 0x54504b43524f434bULL;
+
+  // Binary layout: magic, n, m, core mode, base_k, num_rho, max_core and the
+  // number of remaining vertices as uint64, followed by the coreness of every
+  // vertex and the remaining vertices, as NodeId whatever the width of Core.
+  // Written to a temporary file and renamed, so an interrupted write keeps the
+  // previous checkpoint.
+  void write_checkpoint(NodeId base_k, size_t num_rho, NodeId max_core,
+                        const sequence<NodeId> &remaining_vertices) {
+    auto now = std::chrono::steady_clock::now();
+    if (std::chrono::duration<double>(now - last_checkpoint).count() <
+        checkpoint_interval) {
+      return;
+    }
+    internal::timer t;
+    string tmp_path = string(checkpoint_path) + ".tmp";
+    ofstream ofs(tmp_path, ios::binary);
+    if (!ofs.is_open()) {
+      std::cerr << "Error: Cannot open file " << tmp_path << std::endl;
+      abort();
+    }
+    uint64_t header[8] = {checkpoint_magic,
+                          G.n,
+                          adj.num_edges(),
+                          (uint64_t)adj.core_mode(),
+                          base_k,
+                          num_rho,
+                          max_core,
+                          remaining_vertices.size()};
+    auto wide = tabulate(G.n, [&](size_t i) { return (NodeId)coreness[i]; });
+    ofs.write(reinterpret_cast<char *>(header), sizeof(header));
+    ofs.write(reinterpret_cast<const char *>(wide.begin()),
+              sizeof(NodeId) * G.n);
+    ofs.write(reinterpret_cast<const char *>(remaining_vertices.begin()),
+              sizeof(NodeId) * remaining_vertices.size());
+    ofs.close();
+    if (ofs.fail() || std::rename(tmp_path.c_str(), checkpoint_path) != 0) {
+      std::cerr << "Error: Cannot write checkpoint " << checkpoint_path
+                << std::endl;
+      abort();
+    }
+    t.stop();
+    printf("Checkpoint at k=%u: %zu remaining, %zu bytes, %f s\n", base_k,
+           remaining_vertices.size(),
+           sizeof(header) +
+               sizeof(NodeId) * (G.n + remaining_vertices.size()),
+           t.total_time());
+    last_checkpoint = std::chrono::steady_clock::now();
+  }
+
+  // restores coreness, alive and the remaining vertices; returns false if
+  // there is no checkpoint
+  bool read_checkpoint(NodeId &base_k, size_t &num_rho, NodeId &max_core,
+                       sequence<NodeId> &remaining_vertices) {
+    ifstream ifs(checkpoint_path, ios::binary);
+    if (!ifs.is_open()) {
+      printf("No checkpoint at %s, starting from scratch\n", checkpoint_path);
+      return false;
+    }
+    uint64_t header[8];
+    ifs.read(reinterpret_cast<char *>(header), sizeof(header));
+    if (!ifs || header[0] != checkpoint_magic || header[1] != G.n ||
+        header[2] != adj.num_edges() ||
+        header[3] != (uint64_t)adj.core_mode()) {
+      std::cerr << "Error: " << checkpoint_path
+                << " is not a checkpoint of this graph" << std::endl;
+      abort();
+    }
+    base_k = header[4];
+    num_rho = header[5];
+    max_core = header[6];
+    remaining_vertices = sequence<NodeId>::uninitialized(header[7]);
+    auto wide = sequence<NodeId>::uninitialized(G.n);
+    ifs.read(reinterpret_cast<char *>(wide.begin()), sizeof(NodeId) * G.n);
+    ifs.read(reinterpret_cast<char *>(remaining_vertices.begin()),
+             sizeof(NodeId) * remaining_vertices.size());
+    if (!ifs) {
+      std::cerr << "Error: Truncated checkpoint " << checkpoint_path
+                << std::endl;
+      abort();
+    }
+    parallel_for(0, G.n, [&](size_t i) {
+      coreness[i] = wide[i];
+      alive[i] = false;
+    });
+    parallel_for(0, remaining_vertices.size(),
+                 [&](size_t i) { alive[remaining_vertices[i]] = true; });
+    printf("Resuming from k=%u with %zu remaining vertices\n", base_k,
+           remaining_vertices.size());
+    return true;
+  }
 
  public:
   KCore() = delete;
-  KCore(const Graph &_G) : G(_G), counting_bag(G.n) {
+  KCore(const Graph &_G, CoreMode mode = CoreMode::symmetric)
+      : G(_G), adj(_G, mode), counting_bag(G.n) {
     size_t n = G.n;
     buckets = sequence<hashbag<NodeId>>(
         num_single_buckets + num_intermediate_buckets, hashbag<NodeId>(n));
     frontier = sequence<NodeId>::uninitialized(n);
-    coreness = sequence<NodeId>::uninitialized(n);
+    coreness = sequence<Core>::uninitialized(n);
     alive = sequence<bool>::uninitialized(n);
     sample_mode = sequence<bool>::uninitialized(n);
     samplers = sequence<Sampler>::uninitialized(n);
   }
 
+  const Adjacency<Graph> &adjacency() const { return adj; }
+
+  // places the graph and the solver state on the NUMA nodes, see
+  // numa_policy.h. The bucket pools and the frontier are not indexed by
+  // vertex and are interleaved under every policy but none
+  void place(NumaPolicy policy) {
+    if (policy == NumaPolicy::none) {
+      return;
+    }
+    if (policy == NumaPolicy::replicate) {
+      replicas = replicate_graph(G);
+      adj.set_replicas(&replicas);
+      if (!replicas.empty()) {
+        printf("Replicated the graph on %zu nodes\n", replicas.size());
+      }
+    }
+    if (replicas.empty()) {
+      place_graph(G, policy);
+    }
+    for (auto &bag : buckets) {
+      interleave(bag.buffer());
+    }
+    interleave(counting_bag.buffer());
+    interleave(frontier);
+    place_by_vertex(coreness, G.n, policy);
+    place_by_vertex(alive, G.n, policy);
+    place_by_vertex(sample_mode, G.n, policy);
+    place_by_vertex(samplers, G.n, policy);
+  }
+
+  // writes a checkpoint at a stride boundary of kcore() whenever interval
+  // seconds have passed since the last one (every boundary for 0)
+  void set_checkpoint(char const *path, double interval) {
+    checkpoint_path = path;
+    checkpoint_interval = interval;
+  }
+
+  // the next call of kcore() starts from the checkpoint, if there is one
+  void resume_from_checkpoint() { resume_next = true; }
+
+  // bytes held by the solver, excluding the graph
+  size_t memory_usage() const {
+    size_t bytes = counting_bag.memory_usage();
+    for (auto &bag : buckets) {
+      bytes += bag.memory_usage();
+    }
+    bytes += (frontier.size() + peel_round.size() + peel_depth.size() +
+              peel_ts.size()) *
+             sizeof(NodeId);
+    bytes += coreness.size() * sizeof(Core);
+    bytes += (alive.size() + sample_mode.size()) * sizeof(bool);
+    bytes += samplers.size() * sizeof(Sampler);
+    for (auto &R : replicas) {
+      bytes += R.offsets.size() * sizeof(EdgeId) +
+               R.edges.size() * sizeof(typename Graph::Edge);
+    }
+    return bytes;
+  }
+
+  // record, for every vertex, the global peeling round that removes it and
+  // its depth within that round. A vertex is one level deeper than every
+  // vertex that decremented it, so ordering by (round, depth) puts each vertex
+  // after all neighbors that were subtracted from its degree.
+  void set_record_peel_order(bool record) {
+    record_peel_order = record;
+    if (record && peel_round.size() != G.n) {
+      peel_round = sequence<NodeId>::uninitialized(G.n);
+      peel_depth = sequence<NodeId>::uninitialized(G.n);
+      peel_ts = sequence<NodeId>::uninitialized(G.n);
+    }
+  }
+
+  // called right before u tries to decrement v
+  inline void order_after(NodeId v, NodeId u) {
+    if (record_peel_order) {
+      write_max(&peel_ts[v], peel_depth[u] + 1);
+    }
+  }
+
+  inline void record_peel(NodeId u, size_t round) {
+    if (record_peel_order) {
+      peel_round[u] = round;
+      // snapshot: later writes to peel_ts[u] come from failed decrements
+      peel_depth[u] = peel_ts[u];
+    }
+  }
+
+  // sub-round of every vertex within the rounds that peel its k
+  sequence<NodeId> peel_sub_rounds() const {
+    sequence<NodeId> sub_round(round_k.size());
+    for (size_t r = 1; r < round_k.size(); r++) {
+      sub_round[r] = round_k[r] == round_k[r - 1] ? sub_round[r - 1] + 1 : 0;
+    }
+    return tabulate(G.n, [&](size_t i) { return sub_round[peel_round[i]]; });
+  }
+
+  // vertices ordered by (peeling round, depth), ties broken by id
+  sequence<NodeId> degeneracy_order() const {
+    auto order = tabulate(G.n, [&](size_t i) { return (NodeId)i; });
+    stable_integer_sort_inplace(make_slice(order), [&](NodeId v) {
+      return (uint64_t)peel_round[v] << 32 | peel_depth[v];
+    });
+    return order;
+  }
+
+  // orients every edge from the earlier to the later vertex in the degeneracy
+  // order. The later neighbors of a vertex are never subtracted from its
+  // degree, so its out-degree is at most its coreness.
+  Graph acyclic_orientation() const {
+    size_t n = G.n;
+    auto order = degeneracy_order();
+    auto rank = sequence<NodeId>::uninitialized(n);
+    parallel_for(0, n, [&](size_t i) { rank[order[i]] = i; });
+    auto later = [&](NodeId u) {
+      return [&, u](auto &e) { return rank[e.v] > rank[u]; };
+    };
+    Graph DG;
+    DG.n = n;
+    DG.symmetrized = false;
+    DG.offsets = sequence<EdgeId>::uninitialized(n + 1);
+    parallel_for(0, n, [&](size_t u) {
+      DG.offsets[u] =
+          count_if(G.edges.cut(G.offsets[u], G.offsets[u + 1]), later(u));
+    });
+    DG.offsets[n] = 0;
+    DG.m = scan_inplace(make_slice(DG.offsets));
+    DG.offsets[n] = DG.m;
+    DG.edges = sequence<typename Graph::Edge>::uninitialized(DG.m);
+    parallel_for(0, n, [&](size_t u) {
+      filter_into_uninitialized(G.edges.cut(G.offsets[u], G.offsets[u + 1]),
+                                DG.edges.cut(DG.offsets[u], DG.offsets[u + 1]),
+                                later(u));
+    });
+    return DG;
+  }
+
   // make sure coreness[v] is the accurate remaining degree before calling the
   // function
   void set_sampler(NodeId v, NodeId k) {
@@ -136,8 +389,9 @@ class KCore {
     }
   }
 
-  void fetch_and_add_vertex(NodeId v, NodeId base_k, NodeId k) {
-    auto [id, succeed] = fetch_and_add_bounded(&coreness[v], -1, k);
+  void fetch_and_add_vertex(NodeId u, NodeId v, NodeId base_k, NodeId k) {
+    order_after(v, u);
+    auto [id, succeed] = fetch_and_add_bounded(&coreness[v], -1, (Core)k);
     id--;
     if (succeed) {
       move_bucket(v, id, base_k);
@@ -145,17 +399,15 @@ class KCore {
   }
 
   void count_alive_neighbors(NodeId u) {
-    coreness[u] = parlay::count_if(G.edges.cut(G.offsets[u], G.offsets[u + 1]),
-                                   [&](auto &es) { return alive[es.v]; });
+    coreness[u] = adj.count(u, [&](NodeId v) { return alive[v]; });
   }
 
   void count_vertex(NodeId u, NodeId k, NodeId base_k) {
     NodeId was = coreness[u];
     count_alive_neighbors(u);
     if (coreness[u] < k) {
-      NodeId alive_last_round = parlay::count_if(
-          G.edges.cut(G.offsets[u], G.offsets[u + 1]),
-          [&](auto &es) { return alive[es.v] || coreness[es.v] == k; });
+      NodeId alive_last_round = adj.count(
+          u, [&](NodeId v) { return alive[v] || coreness[v] == k; });
       if (alive_last_round >= k) {
         // deg[u] is reduced to k in this round
         coreness[u] = k;
@@ -177,9 +429,8 @@ class KCore {
     NodeId was = coreness[u];
     count_alive_neighbors(u);
     if (coreness[u] < k) {
-      NodeId alive_last_round = parlay::count_if(
-          G.edges.cut(G.offsets[u], G.offsets[u + 1]),
-          [&](auto &es) { return alive[es.v] || coreness[es.v] == k; });
+      NodeId alive_last_round = adj.count(
+          u, [&](NodeId v) { return alive[v] || coreness[v] == k; });
       if (alive_last_round >= k) {
         // deg[u] is reduced to k in this round
         coreness[u] = k;
@@ -197,83 +448,126 @@ class KCore {
 
   void map_neighbors_parallel(NodeId u, NodeId base_k, NodeId k,
                               bool &counting_flag) {
-    parallel_for(G.offsets[u], G.offsets[u + 1], [&](size_t es) {
-      auto v = G.edges[es].v;
-      if (coreness[v] > k) {
-        if (enable_sampling && sample_mode[v]) {
-          sample_vertex(u, v, counting_flag);
-        } else {
-          fetch_and_add_vertex(v, base_k, k);
-        }
-      }
-    });
+    adj.map_peel(
+        u,
+        [&](NodeId v) {
+          if (coreness[v] > k) {
+            if (enable_sampling && sample_mode[v]) {
+              sample_vertex(u, v, counting_flag);
+            } else {
+              fetch_and_add_vertex(u, v, base_k, k);
+            }
+          }
+        },
+        true);
   }
 
   void map_neighbors_sequential(NodeId u, NodeId base_k, NodeId k,
                                 bool &counting_flag, NodeId *local_queue,
                                 size_t &rear) {
-    for (EdgeId i = G.offsets[u]; i < G.offsets[u + 1]; i++) {
-      NodeId v = G.edges[i].v;
-      if (coreness[v] > k) {
-        if (enable_sampling && sample_mode[v]) {
-          sample_vertex(u, v, counting_flag);
-        } else {
-          auto [id, succeed] = fetch_and_add_bounded(&coreness[v], -1, k);
-          id--;
-          if (succeed) {
-            if (enable_local_queue && id == k && rear < local_queue_size) {
-              local_queue[rear++] = v;
+    adj.map_peel(
+        u,
+        [&](NodeId v) {
+          if (coreness[v] > k) {
+            if (enable_sampling && sample_mode[v]) {
+              sample_vertex(u, v, counting_flag);
             } else {
-              move_bucket(v, id, base_k);
+              order_after(v, u);
+              auto [id, succeed] =
+                  fetch_and_add_bounded(&coreness[v], -1, (Core)k);
+              id--;
+              if (succeed) {
+                if (enable_local_queue && id == k && rear < local_queue_size) {
+                  local_queue[rear++] = v;
+                } else {
+                  move_bucket(v, id, base_k);
+                }
+              }
             }
           }
-        }
-      }
-    }
+        },
+        false);
   }
 
   void map_neighbors_sequentially_wo_bucketing(NodeId u, NodeId k,
                                                bool &counting_flag,
                                                NodeId *local_queue,
                                                size_t &rear) {
-    for (EdgeId i = G.offsets[u]; i < G.offsets[u + 1]; i++) {
-      NodeId v = G.edges[i].v;
-      if (coreness[v] > k) {
-        if (enable_sampling && sample_mode[v]) {
-          sample_vertex(u, v, counting_flag);
-        } else {
-          auto [id, succeed] = fetch_and_add_bounded(&coreness[v], -1, k);
-          id--;
-          if (succeed && id == k) {
-            if (enable_local_queue && id == k && rear < local_queue_size) {
-              local_queue[rear++] = v;
+    adj.map_peel(
+        u,
+        [&](NodeId v) {
+          if (coreness[v] > k) {
+            if (enable_sampling && sample_mode[v]) {
+              sample_vertex(u, v, counting_flag);
             } else {
-              // insert to the first
-              buckets[0].insert(v);
+              order_after(v, u);
+              auto [id, succeed] =
+                  fetch_and_add_bounded(&coreness[v], -1, (Core)k);
+              id--;
+              if (succeed && id == k) {
+                if (enable_local_queue && id == k && rear < local_queue_size) {
+                  local_queue[rear++] = v;
+                } else {
+                  // insert to the first
+                  buckets[0].insert(v);
+                }
+              }
             }
           }
-        }
-      }
-    }
+        },
+        false);
   }
 
   void map_neighbors_parallel_wo_bucketing(NodeId u, NodeId k,
                                            bool &counting_flag) {
-    parallel_for(G.offsets[u], G.offsets[u + 1], [&](size_t es) {
-      auto v = G.edges[es].v;
-      if (coreness[v] > k) {
-        if (enable_sampling && sample_mode[v]) {
-          sample_vertex(u, v, counting_flag);
-        } else {
-          auto [id, succeed] = fetch_and_add_bounded(&coreness[v], -1, k);
-          id--;
-          if (succeed && id == k) {
-            // insert to the first
-            buckets[0].insert(v);
+    adj.map_peel(
+        u,
+        [&](NodeId v) {
+          if (coreness[v] > k) {
+            if (enable_sampling && sample_mode[v]) {
+              sample_vertex(u, v, counting_flag);
+            } else {
+              order_after(v, u);
+              auto [id, succeed] =
+                  fetch_and_add_bounded(&coreness[v], -1, (Core)k);
+              id--;
+              if (succeed && id == k) {
+                // insert to the first
+                buckets[0].insert(v);
+              }
+            }
           }
-        }
-      }
-    });
+        },
+        true);
+  }
+
+  // decrements the neighbors of u whose degree is still at least hi; the ones
+  // dropping below hi are peeled in the current round through the local queue
+  // if there is room, or join the next round otherwise
+  void map_neighbors_approx(NodeId u, NodeId hi, bool &counting_flag,
+                            NodeId *local_queue, size_t &rear) {
+    bool sequential = adj.peel_size(u) < BLOCK_SIZE;
+    adj.map_peel(
+        u,
+        [&](NodeId v) {
+          if (coreness[v] >= hi) {
+            if (enable_sampling && sample_mode[v]) {
+              sample_vertex(u, v, counting_flag);
+            } else {
+              auto [id, succeed] =
+                  fetch_and_add_bounded(&coreness[v], -1, (Core)(hi - 1));
+              if (succeed && id == hi) {
+                if (enable_local_queue && sequential &&
+                    rear < local_queue_size) {
+                  local_queue[rear++] = v;
+                } else {
+                  buckets[0].insert(v);
+                }
+              }
+            }
+          }
+        },
+        !sequential);
   }
 
   double check_sample_security(NodeId v, size_t k, double sample_rate) {
@@ -290,21 +584,22 @@ class KCore {
     }
   }
 
-  sequence<NodeId> kcore() {
+  sequence<Core> kcore() {
     size_t n = G.n;
     size_t bucketing_pt = 16;
     auto remaining_vertices = parlay::sequence<NodeId>::uninitialized(n);
-    size_t avg_deg = G.m / n;
+    size_t avg_deg = adj.num_edges() / n;
     parallel_for(0, n, [&](size_t i) { remaining_vertices[i] = i; });
     bool contains_sampling_nodes = false;
     // init
     parallel_for(0, n, [&](size_t i) {
-      coreness[i] = G.offsets[i + 1] - G.offsets[i];
+      coreness[i] = adj.degree(i);
       if (enable_sampling &&
           coreness[i] * init_reduce_ratio >= sample_threshold) {
         contains_sampling_nodes = true;
       }
       alive[i] = true;
+      sample_mode[i] = false;
     });
     NodeId max_core = 0;
 
@@ -321,11 +616,38 @@ class KCore {
     internal::timer t_check_n_count("check_n_count", false);
     internal::timer t_rho_round("round", false);
     size_t num_rho = 0;
+    round_k.clear();
+    if (record_peel_order) {
+      parallel_for(0, n, [&](size_t i) { peel_ts[i] = 0; });
+    }
+
+    NodeId resume_k = 0;
+    bool resumed = false;
+    if (checkpoint_path) {
+      last_checkpoint = std::chrono::steady_clock::now();
+      if (resume_next) {
+        resume_next = false;
+        resumed =
+            read_checkpoint(resume_k, num_rho, max_core, remaining_vertices);
+      }
+    }
+    if (resumed) {
+      // sampled degrees are estimates, recount them exactly
+      parallel_for(0, remaining_vertices.size(), [&](size_t i) {
+        NodeId v = remaining_vertices[i];
+        count_alive_neighbors(v);
+        if (contains_sampling_nodes) {
+          set_sampler(v, resume_k);
+        } else {
+          sample_mode[v] = false;
+        }
+      });
+    }
 
     // process from 0 to 16 using a single bucket
     // for (NodeId k = 0; k < bucketing_pt; k++) {
     size_t k = 0;
-    if (avg_deg < bucketing_pt) {
+    if (!resumed && avg_deg < bucketing_pt) {
       while (k < bucketing_pt) {
         // size_t sub_rho = 0;
         if (remaining_vertices.size() == 0) {
@@ -361,12 +683,14 @@ class KCore {
         while (size) {
           // sub_rho++;
           num_rho++;
+          round_k.push_back(k);
           bool counting_flag = false;
           parallel_for(
               0, size,
               [&](size_t j) {
                 auto f = frontier[j];
                 alive[f] = false;
+                record_peel(f, num_rho - 1);
                 if (max_core < coreness[f]) {
                   max_core = coreness[f];
                 }
@@ -377,7 +701,8 @@ class KCore {
                   while (front < rear) {
                     NodeId u = local_queue[front++];
                     alive[u] = false;
-                    size_t deg = G.offsets[u + 1] - G.offsets[u];
+                    record_peel(u, num_rho - 1);
+                    size_t deg = adj.peel_size(u);
                     if (deg < BLOCK_SIZE) {
                       // sequentially insert
                       map_neighbors_sequentially_wo_bucketing(
@@ -412,10 +737,13 @@ class KCore {
 
     // remaining vertices using hierarchical buckets
     if (remaining_vertices.size() > 0) {
-      for (NodeId base_k = 0;; base_k += stride) {
+      for (NodeId base_k = resume_k;; base_k += stride) {
         if (remaining_vertices.size() == 0) {
           break;
         }
+        if (checkpoint_path && !(resumed && base_k == resume_k)) {
+          write_checkpoint(base_k, num_rho, max_core, remaining_vertices);
+        }
         t_insert.start();
         parallel_for(0, remaining_vertices.size(), [&](size_t i) {
           add_to_bucket(remaining_vertices[i], coreness[remaining_vertices[i]],
@@ -473,6 +801,7 @@ class KCore {
           while (size) {
             // sub_rho++;
             num_rho++;
+            round_k.push_back(k);
             // t_rho_round.start();
             bool counting_flag = false;
             parallel_for(
@@ -480,6 +809,7 @@ class KCore {
                 [&](size_t j) {
                   auto f = frontier[j];
                   alive[f] = false;
+                  record_peel(f, num_rho - 1);
                   if (max_core < coreness[f]) {
                     max_core = coreness[f];
                   }
@@ -490,7 +820,8 @@ class KCore {
                     while (front < rear) {
                       NodeId u = local_queue[front++];
                       alive[u] = false;
-                      size_t deg = G.offsets[u + 1] - G.offsets[u];
+                      record_peel(u, num_rho - 1);
+                      size_t deg = adj.peel_size(u);
                       if (deg < BLOCK_SIZE) {
                         map_neighbors_sequential(u, base_k + offset_k, k,
                                                  counting_flag, local_queue,
@@ -543,4 +874,112 @@ class KCore {
     cout << "rho: " << num_rho << endl;
     return coreness;
   }
-};
\ No newline at end of file
+  // (1 + eps)-approximate coreness. Vertices are peeled in geometric degree
+  // ranges [lo, hi) with hi = max(lo + 1, ceil(lo * (1 + eps))): all vertices
+  // whose degree drops below hi are peeled together and get lo. Since every
+  // vertex left at the start of a range has degree at least lo, and no vertex
+  // of the hi-core is ever peeled below hi, the coreness c of a vertex that
+  // gets lo satisfies lo <= c < (1 + eps) * lo.
+  sequence<Core> approx_kcore(double eps)
+    requires std::is_same_v<Core, NodeId>
+  {
+    size_t n = G.n;
+    auto remaining_vertices =
+        tabulate(n, [&](size_t i) { return (NodeId)i; });
+    bool contains_sampling_nodes = false;
+    parallel_for(0, n, [&](size_t i) {
+      coreness[i] = adj.degree(i);
+      if (enable_sampling &&
+          coreness[i] * init_reduce_ratio >= sample_threshold) {
+        contains_sampling_nodes = true;
+      }
+      alive[i] = true;
+      sample_mode[i] = false;
+    });
+    if (contains_sampling_nodes) {
+      parallel_for(0, n, [&](size_t i) { set_sampler(i, 0); });
+    }
+
+    size_t num_rho = 0;
+    NodeId max_core = 0;
+    for (NodeId lo = 0; remaining_vertices.size() > 0;) {
+      NodeId hi = std::max(lo + 1, (NodeId)std::ceil(lo * (1 + eps)));
+      parallel_for(0, remaining_vertices.size(), [&](size_t i) {
+        NodeId v = remaining_vertices[i];
+        if (contains_sampling_nodes && sample_mode[v]) {
+          // prob check
+          double error_rate = check_sample_security(
+              v, hi,
+              samplers[v].get_exp_hits() /
+                  ((1 - init_reduce_ratio) * coreness[v]));
+          if (error_rate >= error_rate_tolerance) {
+            count_alive_neighbors(v);
+            set_sampler(v, lo);
+          }
+        }
+        if (coreness[v] < hi) {
+          buckets[0].insert(v);
+        }
+      });
+      auto size = buckets[0].pack_into(make_slice(frontier));
+      if (size) {
+        max_core = lo;
+      }
+      while (size) {
+        num_rho++;
+        bool counting_flag = false;
+        parallel_for(
+            0, size,
+            [&](size_t j) {
+              NodeId local_queue[local_queue_size];
+              size_t front = 0, rear = 0;
+              local_queue[rear++] = frontier[j];
+              while (front < rear) {
+                NodeId u = local_queue[front++];
+                if (atomic_compare_and_swap(&alive[u], true, false)) {
+                  map_neighbors_approx(u, hi, counting_flag, local_queue,
+                                       rear);
+                  coreness[u] = lo;
+                }
+              }
+            },
+            1);
+        if (counting_flag) {
+          auto counting_vertices = counting_bag.pack();
+          parallel_for(0, counting_vertices.size(), [&](size_t j) {
+            NodeId u = counting_vertices[j];
+            if (alive[u]) {
+              count_alive_neighbors(u);
+              if (coreness[u] < hi) {
+                buckets[0].insert(u);
+              }
+              set_sampler(u, lo);
+            }
+          });
+        }
+        size = buckets[0].pack_into(make_slice(frontier));
+      }
+      remaining_vertices = parlay::filter(remaining_vertices,
+                                          [&](NodeId v) { return alive[v]; });
+      lo = hi;
+    }
+    printf("coreness: %u\n", max_core);
+    cout << "rho: " << num_rho << endl;
+    return coreness;
+  }
+};
+
+// calls f(std::type_identity<T>()) with the narrowest of uint8_t, uint16_t
+// and uint32_t that holds max_degree
+template <class F>
+void with_core_type(size_t max_degree, F f) {
+  if (max_degree <= UINT8_MAX) {
+    f(std::type_identity<uint8_t>());
+  } else if (max_degree <= UINT16_MAX) {
+    f(std::type_identity<uint16_t>());
+  } else {
+    f(std::type_identity<uint32_t>());
+  }
+}
+
+#endif  // KCORE_H
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Client for kcore_server.
+
+Usage:
+    python3 kcore_client.py -S /tmp/kcore.sock load graph.bin --symmetric
+    python3 kcore_client.py -S /tmp/kcore.sock coreness graph.bin 0 1 2
+    python3 kcore_client.py -S /tmp/kcore.sock kcore graph.bin 10
+    python3 kcore_client.py -S /tmp/kcore.sock stats graph.bin
+    python3 kcore_client.py -S /tmp/kcore.sock list
+    python3 kcore_client.py -S /tmp/kcore.sock evict graph.bin
+    python3 kcore_client.py -S /tmp/kcore.sock shutdown
+"""
+
+import argparse
+import os
+import socket
+import sys
+
+
+def parse_fields(tokens):
+    """Parse key=value tokens into a dict, converting numbers"""
+    fields = {}
+    for token in tokens:
+        key, value = token.split('=', 1)
+        try:
+            fields[key] = int(value)
+        except ValueError:
+            fields[key] = float(value)
+    return fields
+
+
+class KCoreClient:
+    """One connection to a kcore_server; requests are answered in order"""
+
+    def __init__(self, socket_path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self.reader = self.sock.makefile('r')
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def request(self, *tokens):
+        """Send one request line and return the tokens of the response"""
+        self.sock.sendall((' '.join(map(str, tokens)) + '\n').encode())
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("kcore_server closed the connection")
+        status, _, rest = line.rstrip('\n').partition(' ')
+        if status != 'OK':
+            raise RuntimeError(rest)
+        return rest.split()
+
+    def load(self, graph, symmetric=False):
+        tokens = ['LOAD', os.path.abspath(graph)]
+        if symmetric:
+            tokens.append('symmetric')
+        return parse_fields(self.request(*tokens))
+
+    def coreness(self, graph, vertices):
+        ret = self.request('CORENESS', os.path.abspath(graph), *vertices)
+        return [int(x) for x in ret]
+
+    def kcore(self, graph, k):
+        """Vertices of the k-core"""
+        ret = self.request('KCORE', os.path.abspath(graph), k)
+        return [int(x) for x in ret[1:]]
+
+    def stats(self, graph):
+        return parse_fields(self.request('STATS', os.path.abspath(graph)))
+
+    def list(self):
+        """Cached graphs and their sizes in bytes, most recently used first"""
+        entries = {}
+        for token in self.request('LIST'):
+            path, _, size = token.rpartition(':')
+            entries[path] = int(size)
+        return entries
+
+    def evict(self, graph):
+        self.request('EVICT', os.path.abspath(graph))
+
+    def shutdown(self):
+        self.request('SHUTDOWN')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a running kcore_server")
+    parser.add_argument('-S', '--socket', default='/tmp/kcore.sock',
+                        help="Unix socket of the server")
+    sub = parser.add_subparsers(dest='command', required=True)
+    load = sub.add_parser('load')
+    load.add_argument('graph')
+    load.add_argument('-s', '--symmetric', action='store_true')
+    coreness = sub.add_parser('coreness')
+    coreness.add_argument('graph')
+    coreness.add_argument('vertices', nargs='+', type=int)
+    kcore = sub.add_parser('kcore')
+    kcore.add_argument('graph')
+    kcore.add_argument('k', type=int)
+    for name in ['stats', 'evict']:
+        sub.add_parser(name).add_argument('graph')
+    sub.add_parser('list')
+    sub.add_parser('shutdown')
+    args = parser.parse_args()
+
+    try:
+        with KCoreClient(args.socket) as client:
+            if args.command == 'load':
+                print(client.load(args.graph, args.symmetric))
+            elif args.command == 'coreness':
+                for v, c in zip(args.vertices,
+                                client.coreness(args.graph, args.vertices)):
+                    print(f"{v}\t{c}")
+            elif args.command == 'kcore':
+                members = client.kcore(args.graph, args.k)
+                print(f"{len(members)} vertices")
+                print(' '.join(map(str, members)))
+            elif args.command == 'stats':
+                print(client.stats(args.graph))
+            elif args.command == 'list':
+                for path, size in client.list().items():
+                    print(f"{path}\t{size}")
+            elif args.command == 'evict':
+                client.evict(args.graph)
+            elif args.command == 'shutdown':
+                client.shutdown()
+    except (OSError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
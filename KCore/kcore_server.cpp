@@ -0,0 +1,475 @@
+// A long-running k-core service. Graphs are loaded once and kept, together
+// with their coreness once computed, in an LRU cache bounded by memory. The
+// solver is allocated at load time and released after the first query.
+// Clients talk to the server over a Unix socket with a line-based protocol:
+// every request is one line, and every response is one line starting with
+// "OK" or "ERR <message>".
+//
+//   LOAD <graph> [symmetric]  load a graph, symmetrized unless "symmetric";
+//                             fails if it is cached with the other setting
+//   CORENESS <graph> <v>...   coreness of the given vertices
+//   KCORE <graph> <k>         number and ids of the vertices in the k-core
+//   STATS <graph>             n, m, max core, size of the max core, timings
+//   LIST                      cached graphs and their sizes in bytes
+//   EVICT <graph>             drop a graph from the cache
+//   SHUTDOWN                  stop the server
+//
+// Queries on a graph that is not cached load it first, symmetrized. Requests
+// from all connections go through a single queue and run one at a time, each
+// using every Parlay worker.
+
+#include <fcntl.h>
+#include <sys/socket.h>
+#include <sys/stat.h>
+#include <sys/un.h>
+#include <unistd.h>
+
+#include <condition_variable>
+#include <cstring>
+#include <future>
+#include <list>
+#include <memory>
+#include <mutex>
+#include <queue>
+#include <sstream>
+#include <string>
+#include <thread>
+#include <unordered_map>
+#include <vector>
+
+#include "graph.h"
+#include "kcore.h"
+#include "parlay/internal/get_time.h"
+#include "parlay/sequence.h"
+
+using namespace std;
+using namespace parlay;
+
+using NodeId = Graph<>::NodeId;
+
+struct Entry {
+  Graph<> G;
+  // read as symmetric, without symmetrizing
+  bool symmetric = false;
+  // allocated at load time, released once the coreness is computed
+  unique_ptr<KCore<Graph<>>> solver;
+  sequence<NodeId> coreness;
+  NodeId max_core = 0;
+  size_t max_core_size = 0;
+  double load_time = 0;
+  double kcore_time = 0;
+
+  size_t memory_usage() const {
+    size_t bytes = G.offsets.size() * sizeof(Graph<>::EdgeId) +
+                   G.edges.size() * sizeof(Graph<>::Edge) +
+                   coreness.size() * sizeof(NodeId);
+    if (solver) {
+      bytes += solver->memory_usage();
+    }
+    return bytes;
+  }
+};
+
+// offsets from 0 to m in order and neighbor ids below n
+bool valid_csr(const Graph<> &G) {
+  size_t n = G.n;
+  if (G.offsets.size() != n + 1 || G.offsets[0] != 0 || G.offsets[n] != G.m) {
+    return false;
+  }
+  bool sorted = count_if(iota(n), [&](size_t i) {
+                  return G.offsets[i] > G.offsets[i + 1];
+                }) == 0;
+  return sorted &&
+         count_if(G.edges, [&](auto &e) { return e.v >= n; }) == 0;
+}
+
+// read_graph aborts or reads past the end of malformed files, so the
+// structure of a file is checked as it is read. A .bin file is checked by its
+// size before read_graph; a .adj file is tokenized once here and the graph is
+// built from the tokens (edge weights are skipped). Returns an error message,
+// or an empty string if G holds the graph.
+string read_graph_file(const string &path, Graph<> &G) {
+  size_t dot = path.find_last_of('.');
+  string ext = dot == string::npos ? "" : path.substr(dot + 1);
+  if (ext == "bin") {
+    int fd = open(path.c_str(), O_RDONLY);
+    struct stat sb;
+    uint64_t header[3];
+    bool ok = fd != -1 && fstat(fd, &sb) != -1 &&
+              read(fd, header, sizeof(header)) == sizeof(header);
+    if (fd != -1) {
+      close(fd);
+    }
+    // n and m are bounded first so that the expected size cannot overflow
+    if (!ok || header[0] >= numeric_limits<NodeId>::max() ||
+        header[1] > (uint64_t)sb.st_size ||
+        (uint64_t)sb.st_size !=
+            3 * 8 + (header[0] + 1) * 8 + header[1] * sizeof(NodeId)) {
+      return path + " is not a valid .bin graph";
+    }
+    G.read_graph(path.c_str());
+  } else if (ext == "adj") {
+    auto tokens_seq = tokens(chars_from_file(path));
+    if (tokens_seq.size() < 3) {
+      return path + " is not a valid .adj graph";
+    }
+    size_t weights;
+    if (tokens_seq[0] == to_chars("AdjacencyGraph")) {
+      weights = 0;
+    } else if (tokens_seq[0] == to_chars("WeightedAdjacencyGraph")) {
+      weights = 1;
+    } else {
+      return path + " is not a valid .adj graph";
+    }
+    size_t n = chars_to_ulong_long(tokens_seq[1]);
+    size_t m = chars_to_ulong_long(tokens_seq[2]);
+    if (n >= numeric_limits<NodeId>::max() || m > tokens_seq.size() ||
+        tokens_seq.size() != 3 + n + m * (1 + weights)) {
+      return path + " is not a valid .adj graph";
+    }
+    G.n = n;
+    G.m = m;
+    G.offsets = tabulate(n + 1, [&](size_t i) -> Graph<>::EdgeId {
+      return i == n ? m : chars_to_ulong_long(tokens_seq[i + 3]);
+    });
+    G.edges = sequence<Graph<>::Edge>(m);
+    parallel_for(0, m, [&](size_t i) {
+      G.edges[i].v = chars_to_ulong_long(tokens_seq[i + n + 3]);
+    });
+  } else {
+    return path + " is not a .adj or .bin graph";
+  }
+  if (!valid_csr(G)) {
+    return path + " has out of range offsets or vertex ids";
+  }
+  return "";
+}
+
+class GraphCache {
+  size_t memory_limit;
+  list<string> lru;
+  unordered_map<string, pair<unique_ptr<Entry>, list<string>::iterator>>
+      entries;
+
+  // the most recent entry is kept even if it alone exceeds the limit
+  void evict_to_limit() {
+    while (total_memory() > memory_limit && lru.size() > 1) {
+      string victim = lru.back();
+      printf("Evicting %s\n", victim.c_str());
+      evict(victim);
+    }
+  }
+
+ public:
+  GraphCache(size_t _memory_limit) : memory_limit(_memory_limit) {}
+
+  size_t total_memory() const {
+    size_t bytes = 0;
+    for (auto &[path, entry] : entries) {
+      bytes += entry.first->memory_usage();
+    }
+    return bytes;
+  }
+
+  const Entry *find(const string &path) const {
+    auto it = entries.find(path);
+    return it == entries.end() ? nullptr : it->second.first.get();
+  }
+
+  // reads the graph if it is not cached; nullptr and an error message if the
+  // file is not a valid graph
+  Entry *get(const string &path, bool symmetrized, string &error) {
+    auto it = entries.find(path);
+    if (it != entries.end()) {
+      lru.splice(lru.begin(), lru, it->second.second);
+      return it->second.first.get();
+    }
+    internal::timer t;
+    auto entry = make_unique<Entry>();
+    error = read_graph_file(path, entry->G);
+    if (!error.empty()) {
+      return nullptr;
+    }
+    entry->symmetric = symmetrized;
+    if (!symmetrized) {
+      entry->G = make_symmetrized(entry->G);
+    }
+    entry->G.symmetrized = true;
+    entry->solver = make_unique<KCore<Graph<>>>(entry->G);
+    t.stop();
+    entry->load_time = t.total_time();
+    printf("Loaded %s: |V|=%zu, |E|=%zu, %f s\n", path.c_str(), entry->G.n,
+           entry->G.m, entry->load_time);
+    lru.push_front(path);
+    auto ret = entry.get();
+    entries[path] = make_pair(std::move(entry), lru.begin());
+    evict_to_limit();
+    return ret;
+  }
+
+  const sequence<NodeId> &coreness(Entry &entry) {
+    if (entry.solver) {
+      internal::timer t;
+      entry.coreness = entry.solver->kcore();
+      t.stop();
+      entry.kcore_time = t.total_time();
+      entry.solver.reset();
+      entry.max_core = reduce(entry.coreness, maxm<NodeId>());
+      entry.max_core_size = count(entry.coreness, entry.max_core);
+    }
+    return entry.coreness;
+  }
+
+  bool evict(const string &path) {
+    auto it = entries.find(path);
+    if (it == entries.end()) {
+      return false;
+    }
+    lru.erase(it->second.second);
+    entries.erase(it);
+    return true;
+  }
+
+  string list_entries() const {
+    string ret;
+    for (auto &path : lru) {
+      ret += " " + path + ":" +
+             to_string(entries.at(path).first->memory_usage());
+    }
+    return ret;
+  }
+};
+
+bool write_all(int fd, const string &data) {
+  for (size_t sent = 0; sent < data.size();) {
+    ssize_t len = write(fd, data.data() + sent, data.size() - sent);
+    if (len <= 0) {
+      return false;
+    }
+    sent += len;
+  }
+  return true;
+}
+
+struct Request {
+  string line;
+  int fd;
+  // set once the response is written
+  promise<bool> done;
+};
+
+// requests from all connections, run one at a time
+class RequestQueue {
+  mutex mtx;
+  condition_variable cv;
+  queue<Request> requests;
+
+ public:
+  future<bool> push(string line, int fd) {
+    lock_guard<mutex> lock(mtx);
+    requests.push(Request{std::move(line), fd, promise<bool>()});
+    cv.notify_one();
+    return requests.back().done.get_future();
+  }
+
+  Request pop() {
+    unique_lock<mutex> lock(mtx);
+    cv.wait(lock, [&]() { return !requests.empty(); });
+    auto ret = std::move(requests.front());
+    requests.pop();
+    return ret;
+  }
+};
+
+bool parse_vertex(const string &token, size_t n, NodeId &v) {
+  char *end;
+  unsigned long long x = strtoull(token.c_str(), &end, 10);
+  if (token.empty() || *end != '\0' || x >= n) {
+    return false;
+  }
+  v = x;
+  return true;
+}
+
+string handle(GraphCache &cache, const string &line, bool &stop) {
+  istringstream iss(line);
+  vector<string> tokens;
+  for (string token; iss >> token;) {
+    tokens.push_back(token);
+  }
+  if (tokens.empty()) {
+    return "ERR empty request";
+  }
+  const string &cmd = tokens[0];
+  if (cmd == "LIST") {
+    return "OK" + cache.list_entries();
+  }
+  if (cmd == "SHUTDOWN") {
+    stop = true;
+    return "OK";
+  }
+  if (tokens.size() < 2) {
+    return "ERR missing graph";
+  }
+  if (cmd != "LOAD" && cmd != "CORENESS" && cmd != "KCORE" &&
+      cmd != "STATS" && cmd != "EVICT") {
+    return "ERR unknown command " + cmd;
+  }
+  const string &path = tokens[1];
+  if (cmd == "EVICT") {
+    return cache.evict(path) ? "OK" : "ERR " + path + " is not cached";
+  }
+  auto cached = cache.find(path);
+  if (!cached && access(path.c_str(), R_OK) != 0) {
+    return "ERR cannot read " + path;
+  }
+  bool symmetric = cmd == "LOAD" && tokens.size() > 2 &&
+                   tokens[2] == "symmetric";
+  if (cmd == "LOAD" && cached && cached->symmetric != symmetric) {
+    return "ERR " + path + " is cached as " +
+           (cached->symmetric ? "symmetric" : "symmetrized") +
+           ", EVICT it first";
+  }
+  string error;
+  auto entry_ptr = cache.get(path, symmetric, error);
+  if (!entry_ptr) {
+    return "ERR " + error;
+  }
+  auto &entry = *entry_ptr;
+  if (cmd == "LOAD") {
+    return "OK n=" + to_string(entry.G.n) + " m=" + to_string(entry.G.m) +
+           " bytes=" + to_string(entry.memory_usage());
+  }
+  auto &coreness = cache.coreness(entry);
+  size_t n = entry.G.n;
+  if (cmd == "CORENESS") {
+    string ret = "OK";
+    for (size_t i = 2; i < tokens.size(); i++) {
+      NodeId v;
+      if (!parse_vertex(tokens[i], n, v)) {
+        return "ERR invalid vertex " + tokens[i];
+      }
+      ret += " " + to_string(coreness[v]);
+    }
+    return ret;
+  }
+  if (cmd == "KCORE") {
+    NodeId k;
+    if (tokens.size() < 3 ||
+        !parse_vertex(tokens[2], numeric_limits<NodeId>::max(), k)) {
+      return "ERR invalid k";
+    }
+    auto members = pack_index<NodeId>(
+        delayed_seq<bool>(n, [&](size_t i) { return coreness[i] >= k; }));
+    string ret = "OK " + to_string(members.size());
+    for (NodeId v : members) {
+      ret += " " + to_string(v);
+    }
+    return ret;
+  }
+  if (cmd == "STATS") {
+    char buf[256];
+    snprintf(buf, sizeof(buf),
+             "OK n=%zu m=%zu max_core=%u max_core_size=%zu load_time=%f "
+             "kcore_time=%f bytes=%zu",
+             n, entry.G.m, entry.max_core, entry.max_core_size,
+             entry.load_time, entry.kcore_time, entry.memory_usage());
+    return buf;
+  }
+  return "ERR unknown command " + cmd;
+}
+
+void serve_connection(int fd, RequestQueue &requests) {
+  string buffer;
+  char chunk[4096];
+  while (true) {
+    size_t pos;
+    while ((pos = buffer.find('\n')) == string::npos) {
+      ssize_t len = read(fd, chunk, sizeof(chunk));
+      if (len <= 0) {
+        close(fd);
+        return;
+      }
+      buffer.append(chunk, len);
+    }
+    string line = buffer.substr(0, pos);
+    buffer.erase(0, pos + 1);
+    if (!requests.push(line, fd).get()) {
+      close(fd);
+      return;
+    }
+  }
+}
+
+int main(int argc, char *argv[]) {
+  if (argc == 1) {
+    fprintf(stderr,
+            "Usage: %s [-S socket_path] [-M memory_limit]\n"
+            "Options:\n"
+            "\t-S,\tUnix socket to listen on\n"
+            "\t-M,\tcache size in MB (default 4096)\n",
+            argv[0]);
+    exit(EXIT_FAILURE);
+  }
+  char c;
+  char const *socket_path = nullptr;
+  size_t memory_limit = 4096;
+  while ((c = getopt(argc, argv, "S:M:")) != -1) {
+    switch (c) {
+      case 'S':
+        socket_path = optarg;
+        break;
+      case 'M':
+        memory_limit = atoll(optarg);
+        break;
+    }
+  }
+  if (!socket_path) {
+    cerr << "Error: No socket path provided" << endl;
+    abort();
+  }
+
+  sockaddr_un addr;
+  memset(&addr, 0, sizeof(addr));
+  addr.sun_family = AF_UNIX;
+  if (strlen(socket_path) >= sizeof(addr.sun_path)) {
+    cerr << "Error: Socket path too long" << endl;
+    abort();
+  }
+  strcpy(addr.sun_path, socket_path);
+  int listen_fd = socket(AF_UNIX, SOCK_STREAM, 0);
+  unlink(socket_path);
+  if (listen_fd < 0 ||
+      bind(listen_fd, reinterpret_cast<sockaddr *>(&addr), sizeof(addr)) < 0 ||
+      listen(listen_fd, 64) < 0) {
+    cerr << "Error: Cannot listen on " << socket_path << endl;
+    abort();
+  }
+  printf("Listening on %s, cache size %zu MB\n", socket_path, memory_limit);
+  fflush(stdout);
+
+  RequestQueue requests;
+  thread acceptor([&]() {
+    while (true) {
+      int fd = accept(listen_fd, nullptr, nullptr);
+      if (fd < 0) {
+        return;
+      }
+      thread(serve_connection, fd, ref(requests)).detach();
+    }
+  });
+
+  GraphCache cache(memory_limit << 20);
+  bool stop = false;
+  while (!stop) {
+    auto request = requests.pop();
+    string response = handle(cache, request.line, stop) + "\n";
+    request.done.set_value(write_all(request.fd, response));
+    fflush(stdout);
+  }
+  shutdown(listen_fd, SHUT_RDWR);
+  close(listen_fd);
+  acceptor.join();
+  unlink(socket_path);
+  return 0;
+}
@@ -0,0 +1,285 @@
+#ifndef NUMA_POLICY_H
+#define NUMA_POLICY_H
+
+#include <linux/perf_event.h>
+#include <sys/ioctl.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+
+#include <cerrno>
+#include <chrono>
+#include <cstring>
+#include <mutex>
+#include <string>
+#include <thread>
+#include <vector>
+
+#include "parlay/parallel.h"
+#include "parlay/primitives.h"
+#include "parlay/sequence.h"
+
+#ifdef KCORE_NUMA
+#include <numa.h>
+#include <numaif.h>
+#include <sched.h>
+#endif
+
+// none: pages go wherever the first worker to write them runs
+// interleave: all allocations are spread round-robin over the nodes, as with
+//   numactl -i all
+// blocked: the vertices are split into one contiguous range per node, and the
+//   per-vertex arrays, the offsets and the edges of each range are bound to
+//   its node; pages not written yet are placed there on first touch. The
+//   bucket pools, which are not indexed by vertex, are interleaved
+// replicate: interleave, plus one copy of the read-only CSR on every node;
+//   each worker scans the copy of the node it runs on. Falls back to
+//   interleave if a copy does not fit in the free memory of every node
+enum class NumaPolicy { none, interleave, blocked, replicate };
+
+inline bool parse_numa_policy(const std::string &name, NumaPolicy &policy) {
+  if (name == "none") {
+    policy = NumaPolicy::none;
+  } else if (name == "interleave") {
+    policy = NumaPolicy::interleave;
+  } else if (name == "blocked") {
+    policy = NumaPolicy::blocked;
+  } else if (name == "replicate") {
+    policy = NumaPolicy::replicate;
+  } else {
+    return false;
+  }
+  return true;
+}
+
+inline bool numa_supported() {
+#ifdef KCORE_NUMA
+  return numa_available() >= 0;
+#else
+  return false;
+#endif
+}
+
+inline size_t num_numa_nodes() {
+#ifdef KCORE_NUMA
+  return numa_supported() ? numa_num_configured_nodes() : 1;
+#else
+  return 1;
+#endif
+}
+
+// node of the CPU the calling thread runs on. Parlay workers are not pinned,
+// so the CPU is read on every call and mapped through a table built once
+inline int current_numa_node() {
+#ifdef KCORE_NUMA
+  static const std::vector<int> node_of_cpu = []() {
+    std::vector<int> nodes(numa_num_configured_cpus());
+    for (size_t cpu = 0; cpu < nodes.size(); cpu++) {
+      nodes[cpu] = std::max(numa_node_of_cpu(cpu), 0);
+    }
+    return nodes;
+  }();
+  int cpu = sched_getcpu();
+  return cpu >= 0 && (size_t)cpu < node_of_cpu.size() ? node_of_cpu[cpu] : 0;
+#else
+  return 0;
+#endif
+}
+
+// applies to allocations made after the call, before the graph is read
+inline void set_default_numa_policy(NumaPolicy policy) {
+#ifdef KCORE_NUMA
+  if (policy == NumaPolicy::interleave || policy == NumaPolicy::replicate) {
+    numa_set_interleave_mask(numa_all_nodes_ptr);
+  }
+#else
+  (void)policy;
+#endif
+}
+
+// binds the whole pages in [begin, begin + bytes) to node, or interleaves
+// them if node < 0, migrating pages that are already touched
+inline void bind_memory(const void *begin, size_t bytes, int node) {
+#ifdef KCORE_NUMA
+  size_t page = sysconf(_SC_PAGESIZE);
+  uintptr_t first = ((uintptr_t)begin + page - 1) / page * page;
+  uintptr_t last = ((uintptr_t)begin + bytes) / page * page;
+  if (first >= last) {
+    return;
+  }
+  bitmask *nodes = node < 0 ? numa_all_nodes_ptr : numa_allocate_nodemask();
+  if (node >= 0) {
+    numa_bitmask_setbit(nodes, node);
+  }
+  if (mbind((void *)first, last - first,
+            node < 0 ? MPOL_INTERLEAVE : MPOL_BIND, nodes->maskp,
+            nodes->size + 1, MPOL_MF_MOVE) != 0) {
+    std::cerr << "Warning: mbind failed: " << strerror(errno) << std::endl;
+  }
+  if (node >= 0) {
+    numa_bitmask_free(nodes);
+  }
+#else
+  (void)begin;
+  (void)bytes;
+  (void)node;
+#endif
+}
+
+template <class T>
+void interleave(const parlay::sequence<T> &s) {
+  bind_memory(s.begin(), s.size() * sizeof(T), -1);
+}
+
+// binds s[block_start(i), block_start(i + 1)) to node i
+template <class T, class F>
+void bind_blocks(const parlay::sequence<T> &s, F block_start) {
+  for (size_t i = 0; i < num_numa_nodes(); i++) {
+    size_t start = block_start(i), end = block_start(i + 1);
+    bind_memory(s.begin() + start, (end - start) * sizeof(T), i);
+  }
+}
+
+// places a sequence indexed by vertex id (with at most one extra entry)
+template <class T>
+void place_by_vertex(const parlay::sequence<T> &s, size_t n,
+                     NumaPolicy policy) {
+  if (policy == NumaPolicy::blocked) {
+    size_t nodes = num_numa_nodes();
+    bind_blocks(s, [&](size_t i) {
+      return i == nodes ? s.size() : n * i / nodes;
+    });
+  } else if (policy != NumaPolicy::none) {
+    interleave(s);
+  }
+}
+
+// places the offsets by vertex and the edges with their source vertex
+template <class Graph>
+void place_graph(const Graph &G, NumaPolicy policy) {
+  auto place_csr = [&](const auto &offsets, const auto &edges) {
+    if (offsets.size() != G.n + 1) {
+      return;
+    }
+    place_by_vertex(offsets, G.n, policy);
+    if (policy == NumaPolicy::blocked) {
+      size_t nodes = num_numa_nodes();
+      bind_blocks(edges, [&](size_t i) { return offsets[G.n * i / nodes]; });
+    } else if (policy != NumaPolicy::none) {
+      interleave(edges);
+    }
+  };
+  place_csr(G.offsets, G.edges);
+  place_csr(G.in_offsets, G.in_edges);
+}
+
+// one copy of G bound to every node, or nothing if a copy does not fit
+template <class Graph>
+parlay::sequence<Graph> replicate_graph(const Graph &G) {
+  parlay::sequence<Graph> replicas;
+#ifdef KCORE_NUMA
+  size_t bytes = (G.offsets.size() + G.in_offsets.size()) *
+                     sizeof(typename Graph::EdgeId) +
+                 (G.edges.size() + G.in_edges.size()) *
+                     sizeof(typename Graph::Edge);
+  for (size_t i = 0; i < num_numa_nodes(); i++) {
+    long long free_bytes;
+    numa_node_size64(i, &free_bytes);
+    if ((long long)bytes * 2 > free_bytes) {
+      printf("Graph (%zu bytes) too large to replicate on node %zu\n", bytes,
+             i);
+      return replicas;
+    }
+  }
+  for (size_t i = 0; i < num_numa_nodes(); i++) {
+    replicas.push_back(G);
+    auto &R = replicas.back();
+    for (auto *s : {&R.offsets, &R.in_offsets}) {
+      bind_memory(s->begin(), s->size() * sizeof(typename Graph::EdgeId), i);
+    }
+    for (auto *s : {&R.edges, &R.in_edges}) {
+      bind_memory(s->begin(), s->size() * sizeof(typename Graph::Edge), i);
+    }
+  }
+#else
+  (void)G;
+#endif
+  return replicas;
+}
+
+// Loads served by the local and by a remote node (node-loads and
+// node-load-misses in perf) over all Parlay workers, from per-thread hardware
+// counters that each worker opens on itself
+class RemoteAccessCounters {
+  std::vector<int> fds;
+  std::string error;
+
+  static int open_counter(uint64_t result) {
+    perf_event_attr attr;
+    memset(&attr, 0, sizeof(attr));
+    attr.size = sizeof(attr);
+    attr.type = PERF_TYPE_HW_CACHE;
+    attr.config = PERF_COUNT_HW_CACHE_NODE |
+                  (PERF_COUNT_HW_CACHE_OP_READ << 8) | (result << 16);
+    attr.exclude_kernel = 1;
+    attr.exclude_hv = 1;
+    return syscall(SYS_perf_event_open, &attr, 0, -1, -1, 0);
+  }
+
+ public:
+  RemoteAccessCounters() {
+    size_t num_workers = parlay::num_workers();
+    auto opened = parlay::sequence<bool>(num_workers, false);
+    std::mutex mtx;
+    // every iteration waits a little so that all workers pick some up
+    for (int attempt = 0; attempt < 100 && error.empty() &&
+                          parlay::count(opened, true) < num_workers;
+         attempt++) {
+      parlay::parallel_for(
+          0, num_workers * 4,
+          [&](size_t) {
+            size_t id = parlay::worker_id();
+            if (!opened[id]) {
+              opened[id] = true;
+              int loads = open_counter(PERF_COUNT_HW_CACHE_RESULT_ACCESS);
+              int misses = open_counter(PERF_COUNT_HW_CACHE_RESULT_MISS);
+              std::lock_guard<std::mutex> lock(mtx);
+              if (loads < 0 || misses < 0) {
+                error = strerror(errno);
+              }
+              fds.push_back(loads);
+              fds.push_back(misses);
+            }
+            std::this_thread::sleep_for(std::chrono::milliseconds(1));
+          },
+          1);
+    }
+  }
+
+  ~RemoteAccessCounters() {
+    for (int fd : fds) {
+      if (fd >= 0) {
+        close(fd);
+      }
+    }
+  }
+
+  bool available() const { return error.empty(); }
+  const std::string &unavailable_reason() const { return error; }
+
+  // total node loads and remote node loads so far
+  std::pair<uint64_t, uint64_t> read_counts() const {
+    uint64_t loads = 0, remote = 0;
+    for (size_t i = 0; available() && i < fds.size(); i += 2) {
+      uint64_t value;
+      if (::read(fds[i], &value, sizeof(value)) == sizeof(value)) {
+        loads += value;
+      }
+      if (::read(fds[i + 1], &value, sizeof(value)) == sizeof(value)) {
+        remote += value;
+      }
+    }
+    return std::make_pair(loads, remote);
+  }
+};
+
+#endif  // NUMA_POLICY_H
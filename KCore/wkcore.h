@@ -0,0 +1,284 @@
+#ifndef WKCORE_H
+#define WKCORE_H
+
+#include <cstring>
+#include <type_traits>
+
+#include "graph.h"
+#include "hashbag.h"
+#include "parlay/parallel.h"
+#include "parlay/primitives.h"
+#include "parlay/sequence.h"
+#include "utils.h"
+
+using namespace std;
+using namespace parlay;
+
+// Weighted core decomposition (s-cores). The strength of a vertex is the total
+// weight of its edges to remaining vertices, and the s-coreness of v is the
+// largest s such that v belongs to a subgraph in which every vertex has
+// strength at least s. Edge weights must be non-negative.
+//
+// Strengths are kept as 64-bit keys whose order matches the order of the
+// strengths: the strength itself for integral weights, and the bit pattern of
+// the (non-negative) double for floating-point weights. Peeling follows the
+// hierarchical buckets of KCore over the levels of the keys, except that a
+// decrement subtracts the edge weight, may skip several buckets at once, and
+// is bounded below by the current k. For integral weights a level is a single
+// strength. For floating-point weights a level holds the doubles that share
+// the exponent and the top mantissa bits, so that distinct strengths do not
+// each take a stride; the vertices of a level are peeled in rounds at the
+// minimum strength among them. Strides with no remaining vertex are skipped.
+template <class Graph>
+class WeightedKCore {
+  using NodeId = typename Graph::NodeId;
+  using EdgeId = typename Graph::EdgeId;
+  using EdgeTy = typename Graph::EdgeTy;
+  using Key = uint64_t;
+
+  static_assert(std::is_arithmetic_v<EdgeTy>, "edge weights are required");
+
+ public:
+  using Strength =
+      std::conditional_t<std::is_integral_v<EdgeTy>, uint64_t, double>;
+
+ private:
+  // tunable parameters
+  static constexpr bool enable_local_queue = true;
+  static constexpr uint32_t log2_single_buckets = 3;
+  static constexpr uint32_t num_intermediate_buckets = 6;
+  static constexpr size_t BLOCK_SIZE = 128;
+  static constexpr uint32_t local_queue_size = 128;
+
+  // other parameters
+  static constexpr uint32_t num_single_buckets = 1 << log2_single_buckets;
+  static constexpr uint32_t bucket_mask = num_single_buckets - 1;
+  static constexpr Key stride = num_single_buckets << num_intermediate_buckets;
+  // a level of doubles keeps the exponent and 8 mantissa bits, i.e. 256
+  // levels per power of two
+  static constexpr uint32_t float_level_shift = 52 - 8;
+
+  const Graph &G;
+  sequence<hashbag<NodeId>> buckets;
+  sequence<NodeId> frontier;
+  sequence<NodeId> scratch;
+  sequence<Key> strength;
+  sequence<bool> alive;
+
+  static Key to_key(Strength s) {
+    if constexpr (std::is_integral_v<Strength>) {
+      return s;
+    } else {
+      Key key;
+      std::memcpy(&key, &s, sizeof(Key));
+      return key;
+    }
+  }
+
+  static Strength to_strength(Key key) {
+    if constexpr (std::is_integral_v<Strength>) {
+      return key;
+    } else {
+      Strength s;
+      std::memcpy(&s, &key, sizeof(Key));
+      return s;
+    }
+  }
+
+  static Key level(Key key) {
+    if constexpr (std::is_integral_v<Strength>) {
+      return key;
+    } else {
+      return key >> float_level_shift;
+    }
+  }
+
+  // subtracts w from the strength of v without going below k, returns the old
+  // and the new key (equal if nothing changed)
+  pair<Key, Key> fetch_and_sub_bounded(NodeId v, EdgeTy w, Key k) {
+    Key old_key, new_key;
+    do {
+      old_key = strength[v];
+      if (old_key <= k) {
+        return make_pair(old_key, old_key);
+      }
+      Strength s = to_strength(old_key), lower = to_strength(k);
+      new_key = s - lower <= (Strength)w ? k : to_key(s - w);
+    } while (!atomic_compare_and_swap(&strength[v], old_key, new_key));
+    return make_pair(old_key, new_key);
+  }
+
+  // index of the bucket holding level d, or -1 if d is out of range
+  int bucket_id(Key d, Key base_k) {
+    if (d < base_k || d > (base_k | (stride - 1))) {
+      return -1;
+    }
+    if (d < base_k + num_single_buckets) {
+      return d & bucket_mask;
+    }
+    int diff_bit = 63 - __builtin_clzll(d ^ base_k);
+    return diff_bit - log2_single_buckets + num_single_buckets;
+  }
+
+  void add_to_bucket(NodeId u, Key key, Key base_k) {
+    int id = bucket_id(level(key), base_k);
+    if (id >= 0) {
+      buckets[id].insert(u);
+    }
+  }
+
+  // unlike KCore::move_bucket, a decrement can skip several buckets. A vertex
+  // that stays in its level is not inserted again, since it is still in the
+  // bucket or in the frontier of that level
+  void move_bucket(NodeId u, Key old_key, Key new_key, Key base_k) {
+    int id = bucket_id(level(new_key), base_k);
+    if (id >= 0 && id != bucket_id(level(old_key), base_k)) {
+      buckets[id].insert(u);
+    }
+  }
+
+  void map_neighbors(NodeId u, Key base_k, Key k, NodeId *local_queue,
+                     size_t &rear) {
+    auto update = [&](EdgeId es, bool sequential) {
+      NodeId v = G.edges[es].v;
+      if (strength[v] > k) {
+        auto [old_key, new_key] = fetch_and_sub_bounded(v, G.edges[es].w, k);
+        if (old_key != new_key) {
+          if (enable_local_queue && sequential && new_key == k &&
+              rear < local_queue_size) {
+            local_queue[rear++] = v;
+          } else {
+            move_bucket(v, old_key, new_key, base_k);
+          }
+        }
+      }
+    };
+    if (G.offsets[u + 1] - G.offsets[u] < BLOCK_SIZE) {
+      for (EdgeId i = G.offsets[u]; i < G.offsets[u + 1]; i++) {
+        update(i, true);
+      }
+    } else {
+      parallel_for(G.offsets[u], G.offsets[u + 1],
+                   [&](EdgeId i) { update(i, false); });
+    }
+  }
+
+ public:
+  WeightedKCore() = delete;
+  WeightedKCore(const Graph &_G) : G(_G) {
+    size_t n = G.n;
+    buckets = sequence<hashbag<NodeId>>(
+        num_single_buckets + num_intermediate_buckets, hashbag<NodeId>(n));
+    frontier = sequence<NodeId>::uninitialized(n);
+    if constexpr (!std::is_integral_v<Strength>) {
+      scratch = sequence<NodeId>::uninitialized(n);
+    }
+    strength = sequence<Key>::uninitialized(n);
+    alive = sequence<bool>::uninitialized(n);
+    bool negative = count_if(G.edges, [](auto &e) { return e.w < 0; }) > 0;
+    if (negative) {
+      std::cerr << "Error: s-cores require non-negative edge weights"
+                << std::endl;
+      abort();
+    }
+  }
+
+  sequence<Strength> kcore() {
+    size_t n = G.n;
+    auto remaining_vertices = tabulate(n, [&](size_t i) { return (NodeId)i; });
+    parallel_for(0, n, [&](size_t i) {
+      auto weights = delayed_seq<Strength>(
+          G.offsets[i + 1] - G.offsets[i],
+          [&](size_t j) { return G.edges[G.offsets[i] + j].w; });
+      strength[i] = to_key(reduce(weights));
+      alive[i] = true;
+    });
+
+    size_t num_rho = 0;
+    Key max_core = 0;
+    while (remaining_vertices.size() > 0) {
+      // skip strides without any remaining vertex
+      Key base_k = reduce(delayed_seq<Key>(remaining_vertices.size(),
+                                           [&](size_t i) {
+                                             return level(
+                                                 strength
+                                                     [remaining_vertices[i]]);
+                                           }),
+                          minm<Key>()) &
+                   ~(stride - 1);
+      parallel_for(0, remaining_vertices.size(), [&](size_t i) {
+        NodeId v = remaining_vertices[i];
+        add_to_bucket(v, strength[v], base_k);
+      });
+      Key offset_k = 0;
+      for (Key l = base_k; l < base_k + stride; l++) {
+        if (base_k != l) {
+          for (int i = num_intermediate_buckets - 1; i >= 0; i--) {
+            Key mask = ((Key)num_single_buckets << i) - 1;
+            if ((l & mask) == 0) {
+              offset_k += num_single_buckets;
+              auto size = buckets[num_single_buckets + i].pack_into(
+                  make_slice(frontier));
+              parallel_for(0, size, [&](size_t j) {
+                NodeId u = frontier[j];
+                add_to_bucket(u, strength[u], base_k + offset_k);
+              });
+              break;
+            }
+          }
+        }
+        auto pred = [&](NodeId v) {
+          return alive[v] && level(strength[v]) == l;
+        };
+        auto size =
+            buckets[l & bucket_mask].pack_into_pred(make_slice(frontier), pred);
+        while (size) {
+          num_rho++;
+          Key k = l;
+          if constexpr (!std::is_integral_v<Strength>) {
+            k = reduce(delayed_seq<Key>(
+                           size, [&](size_t j) { return strength[frontier[j]]; }),
+                       minm<Key>());
+          }
+          max_core = k;
+          parallel_for(
+              0, size,
+              [&](size_t j) {
+                if (strength[frontier[j]] != k) {
+                  return;
+                }
+                NodeId local_queue[local_queue_size];
+                size_t front = 0, rear = 0;
+                local_queue[rear++] = frontier[j];
+                while (front < rear) {
+                  NodeId u = local_queue[front++];
+                  if (atomic_compare_and_swap(&alive[u], true, false)) {
+                    map_neighbors(u, base_k + offset_k, k, local_queue, rear);
+                  }
+                }
+              },
+              1);
+          if constexpr (std::is_integral_v<Strength>) {
+            size = buckets[l & bucket_mask].pack_into_pred(
+                make_slice(frontier), pred);
+          } else {
+            // the rest of the level is peeled at larger strengths, together
+            // with the vertices that entered the level meanwhile
+            size = parlay::filter_into_uninitialized(
+                frontier.cut(0, size), scratch.cut(0, size), pred);
+            parallel_for(0, size, [&](size_t j) { frontier[j] = scratch[j]; });
+            size += buckets[l & bucket_mask].pack_into_pred(
+                frontier.cut(size, G.n), pred);
+          }
+        }
+      }
+      remaining_vertices = parlay::filter(remaining_vertices,
+                                          [&](NodeId v) { return alive[v]; });
+    }
+    cout << "coreness: " << to_strength(max_core) << endl;
+    cout << "rho: " << num_rho << endl;
+    return map(strength, [&](Key key) { return to_strength(key); });
+  }
+};
+
+#endif  // WKCORE_H
@@ -1,119 +1,135 @@
 import sys
+import os
+import hashlib
 import functools
 import itertools
 import time
 import networkx as nx
-from numpy import array
+import numpy as np
+import scipy.sparse
 
 
 
 
-def cosimrank(G, u, v, alpha=0.9, 
-             max_iter=100, tol=1.0e-6, weight='weight'):
+def cosimrank_pairs(G, pairs, alpha=0.9,
+                   max_iter=100, tol=1.0e-6, weight='weight'):
+  """CoSimRank of every (u, v) in pairs, computed with sparse power iteration.
+
+  The row-stochastic transition matrix is built once in CSR form. All walk
+  vectors (two per pair) are stacked as the columns of one dense n x 2k
+  matrix, so each iteration is a single sparse matrix x dense matrix product.
+  A pair stops accumulating, and its columns are dropped, as soon as both of
+  its vectors converge in l1 norm (err < N * tol), as in the dict version.
+  """
   c = alpha
-  alpha = 1
   if len(G) == 0:
-    return {}
-
-  if not G.is_directed():
-    D = G.to_directed()
-  else:
-    D = G
-
-  # Create a copy in (right) stochastic form
-  W = nx.stochastic_graph(D, weight=weight)
-  N = W.number_of_nodes()
-
-  W_v = nx.stochastic_graph(D, weight=weight)
-  N_v = W.number_of_nodes()
-
-  x = dict.fromkeys(W, 0)
-  x[u] = 1
-  x_v = dict.fromkeys(W, 0)
-  x_v[v] = 1
-
-  p = dict.fromkeys(W, 1.0 / N)
-
-  p_v = dict.fromkeys(W, 1.0 / N)
-
-  dangling_weights = p
-  dangling_weights_v = p_v
-  dangling_nodes = [n for n in W if W.out_degree(n, weight=weight) == 0.0]
-  dangling_nodes_v = [n for n in W if W.out_degree(n, weight=weight) == 0.0]
-
-  sim = 0
+    return np.zeros(len(pairs))
+
+  nodelist = list(G)
+  index = {node: i for i, node in enumerate(nodelist)}
+  N = len(nodelist)
+  A = nx.to_scipy_sparse_array(G, nodelist=nodelist, weight=weight,
+                               dtype=float, format='csr')
+  out_weight = np.asarray(A.sum(axis=1)).ravel()
+  dangling = out_weight == 0
+  inv_out_weight = np.zeros(N)
+  inv_out_weight[~dangling] = 1.0 / out_weight[~dangling]
+  # x^T * W as W^T * x, with W normalized and transposed only once
+  WT = (scipy.sparse.diags(inv_out_weight) @ A).T.tocsr()
+
+  num_pairs = len(pairs)
+  x = np.zeros((N, 2 * num_pairs))
+  for j, (u, v) in enumerate(pairs):
+    x[index[u], 2 * j] = 1
+    x[index[v], 2 * j + 1] = 1
+  sim = np.zeros(num_pairs)
+  active = np.arange(num_pairs)
 
   # power iteration: make up to max_iter iterations
   for iter in range(max_iter):
     xlast = x
-    x = dict.fromkeys(xlast.keys(), 0)
-    danglesum = alpha * sum(xlast[n] for n in dangling_nodes)
-    for n in x:
-      for nbr in W[n]:
-        x[nbr] += alpha * xlast[n] * W[n][nbr][weight]
-      x[n] += danglesum * dangling_weights.get(n, 0) + (1.0 - alpha) * p.get(n, 0)
-    # check convergence, l1 norm
-    err = sum([abs(x[n] - xlast[n]) for n in x])
-    xlast_v = x_v
-    x_v = dict.fromkeys(xlast_v.keys(), 0)
-    danglesum_v = alpha * sum(xlast_v[n] for n in dangling_nodes_v)
-    for n in x_v:
-      # this matrix multiply looks odd because it is
-      # doing a left multiply x^T=xlast^T*W
-      for nbr in W_v[n]:
-        x_v[nbr] += alpha * xlast_v[n] * W_v[n][nbr][weight]
-      x_v[n] += danglesum_v * dangling_weights_v.get(n, 0) + (1.0 - alpha) * p_v.get(n, 0)
+    x = WT @ xlast
+    # dangling nodes spread their mass uniformly
+    x += xlast[dangling].sum(axis=0) / N
     # check convergence, l1 norm
-    err_v = sum([abs(x_v[n] - xlast_v[n]) for n in x_v])
-    sim += (c ** (iter+1)) * sum(x_v[key]*x.get(key, 0) for key in x_v)
-    if err < N * tol and err_v < N_v * tol:
-      return sim
+    err = np.abs(x - xlast).sum(axis=0)
+    sim[active] += (c ** (iter + 1)) * np.einsum('ij,ij->j', x[:, 0::2],
+                                                 x[:, 1::2])
+    converged = (err[0::2] < N * tol) & (err[1::2] < N * tol)
+    if converged.all():
+      break
+    keep = np.flatnonzero(~converged)
+    active = active[keep]
+    x = x[:, np.stack([2 * keep, 2 * keep + 1], axis=1).ravel()]
   return sim
 
+def cosimrank(G, u, v, alpha=0.9,
+             max_iter=100, tol=1.0e-6, weight='weight'):
+  if len(G) == 0:
+    return {}
+  return cosimrank_pairs(G, [(u, v)], alpha=alpha, max_iter=max_iter,
+                         tol=tol, weight=weight)[0]
 
 
 
 
-def read_ligra_symmetric_graph(input_file):
-  G = nx.Graph()
-  with open(input_file, 'r') as reader:
-    reader.readline() # Discard AdjacencyGraph
-    n = int(reader.readline())
-    m = int(reader.readline())
-    offsets = [None] * (n+1)
-    offsets[n] = m
-    edges = [(0, 0)] * m
-    G.add_nodes_from(range(n))
-    for i in range(n):
-      offsets[i] = int(reader.readline())
-    offsets_idx = 0
-    for i in range(m):
-      if offsets[offsets_idx + 1] == i:
-        offsets_idx+=1
-      edges[i] = (offsets_idx, int(reader.readline()))
-    G.add_edges_from(edges)
-  return G
 
-def read_ligra_directed_graph(input_file):
-  G = nx.DiGraph()
-  with open(input_file, 'r') as reader:
+def parse_ligra_csr(input_file):
+  """Parses a Ligra AdjacencyGraph file into (offsets, edges) numpy arrays."""
+  with open(input_file, 'rb') as reader:
     reader.readline() # Discard AdjacencyGraph
-    n = int(reader.readline())
-    m = int(reader.readline())
-    offsets = [None] * (n+1)
-    offsets[n] = m
-    edges = [(0, 0)] * m
-    G.add_nodes_from(range(n))
-    for i in range(n):
-      offsets[i] = int(reader.readline())
-    offsets_idx = 0
-    for i in range(m):
-      if offsets[offsets_idx + 1] == i:
-        offsets_idx+=1
-      edges[i] = (offsets_idx, int(reader.readline()))
-    G.add_edges_from(edges)
+    values = np.array(reader.read().split(), dtype=np.int64)
+  n, m = int(values[0]), int(values[1])
+  offsets = np.empty(n + 1, dtype=np.int64)
+  offsets[:n] = values[2:2 + n]
+  offsets[n] = m
+  edges = values[2 + n:2 + n + m]
+  return offsets, edges
+
+def file_hash(input_file, chunk_size=1 << 24):
+  digest = hashlib.sha1()
+  with open(input_file, 'rb') as reader:
+    for chunk in iter(lambda: reader.read(chunk_size), b''):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+def load_ligra_csr(input_file, symmetric, cache_dir=None):
+  """Returns (offsets, edges) of a Ligra file, using a parsed-graph cache.
+
+  Parsed graphs are stored in cache_dir as uncompressed .npz files keyed by
+  the content hash of the input file and the symmetric flag, so later
+  invocations on the same input skip parsing entirely.
+  """
+  if cache_dir is None:
+    return parse_ligra_csr(input_file)
+  os.makedirs(cache_dir, exist_ok=True)
+  cache_file = os.path.join(cache_dir, "{}_{}.npz".format(
+      file_hash(input_file), "s" if symmetric else "d"))
+  if os.path.exists(cache_file):
+    with np.load(cache_file) as cached:
+      return cached["offsets"], cached["edges"]
+  offsets, edges = parse_ligra_csr(input_file)
+  # write to a temporary name first so a concurrent reader never sees a
+  # partially written cache entry
+  tmp_file = "{}.{}.tmp.npz".format(cache_file[:-len(".npz")], os.getpid())
+  np.savez(tmp_file, offsets=offsets, edges=edges, symmetric=symmetric)
+  os.replace(tmp_file, cache_file)
+  return offsets, edges
+
+def csr_to_nx(offsets, edges, symmetric):
+  G = nx.Graph() if symmetric else nx.DiGraph()
+  n = len(offsets) - 1
+  G.add_nodes_from(range(n))
+  sources = np.repeat(np.arange(n), np.diff(offsets))
+  G.add_edges_from(zip(sources.tolist(), edges.tolist()))
   return G
 
+def read_ligra_symmetric_graph(input_file, cache_dir=None):
+  return csr_to_nx(*load_ligra_csr(input_file, True, cache_dir), True)
+
+def read_ligra_directed_graph(input_file, cache_dir=None):
+  return csr_to_nx(*load_ligra_csr(input_file, False, cache_dir), False)
+
 def TriangleCounting(G):
   print("Start TriangleCounting")
   t0 = time.time()
@@ -186,12 +202,13 @@ def GraphColoring(G, strategy='largest_first'):
   t1 = time.time()
   print("Time: ", t1-t0)
 
-def ActualCoSimRank(G, u=0, v=1, importance_factor=0.85, max_iterations=100, tolerance=0.000001):
+def ActualCoSimRank(G, pairs=((0, 1),), importance_factor=0.85, max_iterations=100, tolerance=0.000001):
   t0 = time.time()
-  similarity = cosimrank(G, u, v,alpha=importance_factor, max_iter=max_iterations, tol=tolerance)
+  similarity = cosimrank_pairs(G, pairs, alpha=importance_factor, max_iter=max_iterations, tol=tolerance)
   t1 = time.time()
   print("Time: ", t1-t0)
-  print("Similarity: ", similarity)
+  for (u, v), sim in zip(pairs, similarity):
+    print("Similarity", (u, v), ": ", sim)
 
 def CoSimRank(G, src=0, ngh=1, importance_factor=0.85, max_iterations=100, tolerance=0.000001):
   print("Start SimRank")
@@ -251,19 +268,51 @@ def program_parser(G, program_str):
       CoSimRank(G)
   elif program_str == "ActualCoSimRank":
     if argv_len > 4:
-      ActualCoSimRank(G, u=int(sys.argv[4]), v=int(sys.argv[5]))
+      # any number of u v pairs may follow
+      ids = [int(arg) for arg in sys.argv[4:]]
+      if len(ids) % 2:
+        sys.exit("ActualCoSimRank takes pairs of vertex ids: u1 v1 [u2 v2 ...]")
+      ActualCoSimRank(G, pairs=list(zip(ids[0::2], ids[1::2])))
     else:
-      CoSimRank(G)
+      ActualCoSimRank(G)
 
 def main():
+  # Options: --no-cache disables the parsed-graph cache, --cache-dir=DIR
+  # overrides its location. They are removed before positional parsing.
+  cache_dir = os.environ.get("LIGRA_NX_CACHE_DIR",
+                             os.path.join(os.path.expanduser("~"), ".cache",
+                                          "ligra_to_nx"))
+  for arg in [arg for arg in sys.argv[1:] if arg.startswith("--")]:
+    if arg == "--no-cache":
+      cache_dir = None
+    elif arg.startswith("--cache-dir="):
+      cache_dir = arg[len("--cache-dir="):]
+    else:
+      sys.exit("Unknown option: {}".format(arg))
+    sys.argv.remove(arg)
   argv_len = len(sys.argv)
   input_file = sys.argv[1] # First arg should be file name (ligra)
   symmetric = (sys.argv[2] == "s") # Second arg should be s or w/e for symmetric or not
-  all_programs = ["ActualCoSimRank","CoSimRank","CoSimRankNumpy","BFS", "MaximalMatching", "KCore", "PageRank", "CliqueCounting", "TriangleCounting", "GeneralWeightSSSP", "GraphColoring"]
+  # CoSimRank and CoSimRankNumpy compute all-pairs SimRank, so they only run
+  # when named explicitly.
+  all_programs = ["ActualCoSimRank","BFS", "MaximalMatching", "KCore", "PageRank", "CliqueCounting", "TriangleCounting", "GeneralWeightSSSP", "GraphColoring"]
   # use read edge list for snap format (TODO)
-  G = read_ligra_symmetric_graph(input_file) if symmetric else read_ligra_directed_graph(input_file)
-  program_str = sys.argv[3] # Third arg should be name of benchmark
-  program_parser(G, program_str)
+  t0 = time.time()
+  G = read_ligra_symmetric_graph(input_file, cache_dir) if symmetric else read_ligra_directed_graph(input_file, cache_dir)
+  t1 = time.time()
+  print("Load time: ", t1-t0)
+  # Third arg should be name of benchmark, a comma-separated list of
+  # benchmarks, or "all". Every benchmark runs on the same loaded graph.
+  program_str = sys.argv[3]
+  programs = all_programs if program_str == "all" else program_str.split(",")
+  program_times = []
+  for program in programs:
+    t0 = time.time()
+    program_parser(G, program)
+    program_times.append((program, time.time() - t0))
+  if len(programs) > 1:
+    for program, program_time in program_times:
+      print("{}: {}".format(program, program_time))
 
 
 if __name__ == "__main__":
@@ -13,15 +13,23 @@ This script could be extended to further split benchmarks into ones that process
 symmetric graphs versus asymmetric graphs, but currently the input graphs must
 be symmetric so that all benchmarks can run on them.
 
+Benchmarks are run directly from their built binaries rather than through
+`bazel run`. With `--cpus_per_job`, independent benchmarks run concurrently on
+disjoint CPU sets, and `--report` collects the wall time of each benchmark.
+
 This script should be invoked directly via Python >=3.7. Because this script
 calls other Bazel commands, invoking it with `bazel run` won't work.
 """
-from typing import List, Optional, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import argparse
+import concurrent.futures
+import csv
 import fnmatch
 import os
+import queue
 import sys
 import subprocess
+import time
 
 # The script will invoke these benchmark on an unweighted graph.
 UNWEIGHTED_GRAPH_BENCHMARKS = [
@@ -179,6 +187,52 @@ def check_listed_binaries(
             )
 
 
+def get_binary_paths(benchmarks: List[str], bazel_flags: List[str]) -> Dict[str, str]:
+    """Resolves the on-disk path of each built benchmark binary.
+
+    A `cc_binary` target `//pkg:name` is placed at `<bazel-bin>/pkg/name`, so a
+    single `bazel info` call is enough to locate every binary. Running the
+    binaries directly avoids paying Bazel client/server startup and analysis
+    for every benchmark, which is what `bazel run` does.
+
+    Args:
+        benchmarks: Bazel labels of the benchmarks.
+        bazel_flags: Flags the benchmarks were built with. They determine the
+            output directory, so they must match the flags given to
+            `bazel build`.
+
+    Returns:
+        A mapping from each benchmark label to the absolute path of its binary.
+    """
+    bazel_bin = subprocess.run(
+        ["bazel", "info"] + bazel_flags + ["bazel-bin"],
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    ).stdout.strip()
+    binary_paths = {}
+    for benchmark in benchmarks:
+        package, name = benchmark.lstrip("@").lstrip("/").split(":")
+        binary_paths[benchmark] = os.path.join(bazel_bin, package, name)
+    return binary_paths
+
+
+def partition_cpus(cpus_per_job: int) -> List[Set[int]]:
+    """Splits the CPUs available to this process into disjoint sets.
+
+    Args:
+        cpus_per_job: Number of CPUs in each set. The last set may be smaller
+            if the number of available CPUs is not a multiple of this.
+
+    Returns:
+        A list of disjoint CPU sets covering all available CPUs.
+    """
+    cpus = sorted(os.sched_getaffinity(0))
+    return [
+        set(cpus[i : i + cpus_per_job]) for i in range(0, len(cpus), cpus_per_job)
+    ]
+
+
 def run_all_benchmarks(
     unweighted_graph_benchmarks: List[str],
     weighted_graph_benchmarks: List[str],
@@ -186,9 +240,15 @@ def run_all_benchmarks(
     weighted_graph_file: Optional[str],
     are_graphs_compressed: bool,
     timeout: Optional[int],
+    cpus_per_job: Optional[int] = None,
+    report_file: Optional[str] = None,
 ) -> List[Tuple[str, str]]:
     """Runs all benchmarks, returning a list of failing benchmarks.
 
+    With `cpus_per_job`, benchmarks run concurrently, each pinned to its own
+    disjoint set of CPUs. Otherwise they run one at a time on all available
+    CPUs.
+
     Args:
         unweighted_graph_benchmarks: List of all benchmarks to run on the
             unweighted graph.
@@ -201,6 +261,10 @@ def run_all_benchmarks(
         timeout: Benchmarks that run longer than this timeout period in seconds
             are considered to have failed. If this is `None` then the benchmarks
             have no time limit.
+        cpus_per_job: Number of CPUs given to each benchmark. If this is `None`
+            then the benchmarks run one at a time on all available CPUs.
+        report_file: If provided, a CSV file to which the wall time and status
+            of each benchmark is written.
 
     Returns:
         A list of names of benchmarks that fail along with a failure reason.
@@ -211,56 +275,86 @@ def run_all_benchmarks(
     if are_graphs_compressed:
         gbbs_flags += ["-c"]
 
-    benchmarks = []
+    jobs = []
     if unweighted_graph_file:
-        benchmarks += unweighted_graph_benchmarks
+        jobs += [
+            (benchmark, unweighted_graph_file, [])
+            for benchmark in unweighted_graph_benchmarks
+        ]
     if weighted_graph_file:
-        benchmarks += weighted_graph_benchmarks
+        jobs += [
+            (benchmark, weighted_graph_file, ["-w"])
+            for benchmark in weighted_graph_benchmarks
+        ]
+    benchmarks = [benchmark for benchmark, _, _ in jobs]
     # Compile all the benchmarks up front --- it's faster than compiling
     # them individually since Bazel can compile several files in parallel.
     subprocess.run(["bazel", "build"] + BAZEL_FLAGS + ["--keep_going"] + benchmarks)
+    binary_paths = get_binary_paths(benchmarks, BAZEL_FLAGS)
 
-    failed_benchmarks = []
+    cpu_sets = partition_cpus(cpus_per_job or len(os.sched_getaffinity(0)))
+    free_cpu_sets: "queue.Queue[Set[int]]" = queue.Queue()
+    for cpu_set in cpu_sets:
+        free_cpu_sets.put(cpu_set)
 
     def test_benchmark(
         benchmark: str, graph_file: str, additional_gbbs_flags: List[str]
-    ) -> None:
+    ) -> Tuple[str, Optional[str], float, int]:
+        binary = binary_paths[benchmark]
+        if not os.access(binary, os.X_OK):
+            return benchmark, "Binary not built", 0.0, 0
+        cpus = free_cpu_sets.get()
+        env = dict(os.environ, PARLAY_NUM_THREADS=str(len(cpus)))
+        start_time = time.perf_counter()
+        # Pin with `taskset` rather than a `preexec_fn`, which may deadlock
+        # the child when called from a thread.
+        pin = ["taskset", "-c", ",".join(str(cpu) for cpu in sorted(cpus))]
         try:
             benchmark_run = subprocess.run(
-                ["bazel", "run"]
-                + BAZEL_FLAGS
-                + [benchmark, "--"]
-                + gbbs_flags
-                + additional_gbbs_flags
-                + [graph_file],
+                pin + [binary] + gbbs_flags + additional_gbbs_flags + [graph_file],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                env=env,
                 timeout=timeout,
             )
             if benchmark_run.returncode:
-                failed_benchmarks.append(
-                    (
-                        benchmark,
-                        "Exited with error code {}".format(benchmark_run.returncode),
-                    )
+                print(benchmark_run.stdout)
+                failure = "Exited with error code {}".format(
+                    benchmark_run.returncode
                 )
+            else:
+                failure = None
         except subprocess.TimeoutExpired:
-            failed_benchmarks.append((benchmark, "Timeout"))
+            failure = "Timeout"
+        finally:
+            wall_time = time.perf_counter() - start_time
+            free_cpu_sets.put(cpus)
+        print(
+            "{} {} ({:.2f}s)".format(
+                "FAILED" if failure else "PASSED", benchmark, wall_time
+            ),
+            flush=True,
+        )
+        return benchmark, failure, wall_time, len(cpus)
 
-    if unweighted_graph_file:
-        for benchmark in unweighted_graph_benchmarks:
-            test_benchmark(
-                benchmark=benchmark,
-                graph_file=unweighted_graph_file,
-                additional_gbbs_flags=[],
-            )
-    if weighted_graph_file:
-        for benchmark in weighted_graph_benchmarks:
-            test_benchmark(
-                benchmark=benchmark,
-                graph_file=weighted_graph_file,
-                additional_gbbs_flags=["-w"],
-            )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(cpu_sets)) as pool:
+        results = list(pool.map(lambda job: test_benchmark(*job), jobs))
 
-    return failed_benchmarks
+    if report_file:
+        with open(report_file, "w", newline="") as report:
+            writer = csv.writer(report)
+            writer.writerow(["benchmark", "status", "wall_time", "num_cpus"])
+            for benchmark, failure, wall_time, num_cpus in sorted(
+                results, key=lambda result: -result[2]
+            ):
+                writer.writerow(
+                    [benchmark, failure or "OK", "{:.3f}".format(wall_time), num_cpus]
+                )
+
+    return [
+        (benchmark, failure) for benchmark, failure, _, _ in results if failure
+    ]
 
 
 if __name__ == "__main__":
@@ -309,6 +403,22 @@ if __name__ == "__main__":
         default=60,
         help="(seconds) - Halt benchmarks that run longer than this time.",
     )
+    parser.add_argument(
+        "--cpus_per_job",
+        "-j",
+        type=int,
+        help=(
+            "Run benchmarks concurrently, each pinned to a disjoint set of this "
+            "many CPUs. If not provided, benchmarks run one at a time on all "
+            "available CPUs."
+        ),
+    )
+    parser.add_argument(
+        "--report",
+        "-r",
+        type=str,
+        help="CSV file to which the wall time of each benchmark is written.",
+    )
     parsed_args = parser.parse_args()
     if not parsed_args.unweighted_graph and not parsed_args.weighted_graph:
         parser.error(
@@ -333,6 +443,8 @@ if __name__ == "__main__":
         weighted_graph_file=weighted_graph_file,
         are_graphs_compressed=parsed_args.compressed,
         timeout=parsed_args.timeout,
+        cpus_per_job=parsed_args.cpus_per_job,
+        report_file=parsed_args.report,
     )
     if failed_benchmarks:
         print("Benchmarks failed: {}".format(failed_benchmarks))
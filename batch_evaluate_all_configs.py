@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
 import os
+import shutil
 import subprocess
 import csv
 import re
+import tempfile
 from pathlib import Path
 
+from perf_db import PerfDB, git_commit, git_dirty, parse_round_times
+
 def modify_kcore_header(enable_sampling, enable_local_queue, enable_bucketing):
     """Modify kcore.h with the specified parameter values"""
     header_file = Path("KCore/kcore.h")
@@ -70,11 +74,11 @@ def compile_kcore():
     """Compile the KCore executable"""
     try:
         result = subprocess.run(
-            ["make", "-C", "KCore"],
+            ["make", "-C", "KCore", "kcore"],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             universal_newlines=True,
-            timeout=120
+            timeout=600
         )
         
         if result.returncode != 0:
@@ -85,41 +89,159 @@ def compile_kcore():
         return True
         
     except subprocess.TimeoutExpired:
-        print("  ✗ Compilation timed out (>120s)")
+        print("  ✗ Compilation timed out (>600s)")
         return False
     except Exception as e:
         print(f"  ✗ Compilation error: {e}")
         return False
 
-def run_kcore_on_graph(graph_path, kcore_executable):
-    """Run KCore on a single graph and extract average timing information"""
+# Hardware and software events of the profiling mode. node-load-misses are
+# loads served by a remote NUMA node, i.e. remote DRAM or remote caches
+PERF_EVENTS = [
+    "cycles",
+    "instructions",
+    "L1-dcache-load-misses",
+    "LLC-load-misses",
+    "node-load-misses",
+    "context-switches",
+    "cpu-migrations",
+]
+
+def perf_stat_command(cmd, events, output, control=None):
+    """Wrap cmd in perf stat, writing CSV counters to output. With control
+    fifos (ctl, ack), counting starts disabled and kcore enables it only
+    around its timed rounds"""
+    perf = ["perf", "stat", "-x", ",", "-o", str(output), "-e", ",".join(events)]
+    if control:
+        perf += ["--control", f"fifo:{control[0]},{control[1]}", "-D", "-1"]
+    return perf + ["--"] + cmd
+
+def parse_perf_stat(text):
+    """Counts by event from perf stat -x output; None if not supported or not
+    counted. Counts of the same event on several PMUs (cpu_core/cycles/ and
+    cpu_atom/cycles/ on hybrid CPUs) are added up"""
+    counters = {}
+    for line in text.splitlines():
+        fields = line.split(',')
+        if line.startswith('#') or len(fields) < 3 or not fields[2]:
+            continue
+        # cpu_core/cycles/u -> cycles
+        event = re.sub(r'^\w+/(.*)/\w*$', r'\1', fields[2]).split(':')[0]
+        try:
+            value = float(fields[0])
+        except ValueError:
+            counters.setdefault(event, None)
+            continue
+        counters[event] = (counters.get(event) or 0) + value
+    return counters
+
+def derived_metrics(counters):
+    """IPC and misses per thousand instructions, where counted"""
+    metrics = {}
+    cycles, instructions = counters.get("cycles"), counters.get("instructions")
+    if cycles and instructions:
+        metrics['ipc'] = instructions / cycles
+    for event, name in (("L1-dcache-load-misses", "l1_mpki"),
+                        ("LLC-load-misses", "llc_mpki"),
+                        ("node-load-misses", "remote_mpki")):
+        if instructions and counters.get(event) is not None:
+            metrics[name] = counters[event] / instructions * 1000
+    return metrics
+
+def run_kcore_on_graph(graph_path, kcore_executable, profile=None):
+    """Run KCore on a single graph and extract the average and per-round times.
+    With profile ({'events': [...], 'scope': 'kcore' or 'process'}), the run is
+    wrapped in perf stat and its counters are returned too, per timed round for
+    the kcore scope and for the whole process otherwise"""
     try:
         cmd = [str(kcore_executable), "-i", str(graph_path)]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=600)
+        with tempfile.TemporaryDirectory() as tmp:
+            env = None
+            if profile:
+                perf_output = Path(tmp) / "perf.csv"
+                control = None
+                if profile['scope'] == 'kcore':
+                    control = (Path(tmp) / "ctl", Path(tmp) / "ack")
+                    for fifo in control:
+                        os.mkfifo(fifo)
+                    env = dict(os.environ, KCORE_PERF_CTL=str(control[0]),
+                               KCORE_PERF_ACK=str(control[1]))
+                cmd = perf_stat_command(cmd, profile['events'], perf_output, control)
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=600, env=env)
+            counters = {}
+            if profile and perf_output.exists():
+                counters = parse_perf_stat(perf_output.read_text())
         
         if result.returncode != 0:
             print(f"  ✗ Execution failed: {result.stderr}")
-            return None
+            return None, [], {}
         
         # Extract average time from stdout
         output = result.stdout
         avg_match = re.search(r'Average time: ([\d.]+)', output)
         
         if avg_match:
-            return float(avg_match.group(1))
+            round_times = parse_round_times(output)
+            if profile and profile['scope'] == 'kcore' and round_times:
+                counters = {event: None if value is None else value / len(round_times)
+                            for event, value in counters.items()}
+            return float(avg_match.group(1)), round_times, counters
         else:
             print(f"  ✗ Could not extract average time from output")
-            return None
+            return None, [], {}
             
     except subprocess.TimeoutExpired:
         print(f"  ✗ Execution timed out (>600s)")
-        return None
+        return None, [], {}
     except Exception as e:
         print(f"  ✗ Execution error: {e}")
-        return None
+        return None, [], {}
 
-def batch_evaluate_all_configs(graph_paths, output_csv="batch_results_all_configs.csv"):
-    """Run KCore on multiple graphs with all 4 parameter combinations"""
+def write_profile(results, profile, output_csv):
+    """Counters and derived metrics joined with the timings, one row per
+    (graph, config), and a per-graph summary"""
+    events = profile['events']
+    metric_names = ['ipc', 'l1_mpki', 'llc_mpki', 'remote_mpki']
+    fieldnames = ['graph', 'config', 'avg_time', 'scope'] + events + metric_names
+    with open(output_csv, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for result in results:
+            counters = result['counters']
+            metrics = derived_metrics(counters)
+            row = {'graph': result['graph'], 'config': result['config'],
+                   'avg_time': result['avg_time'], 'scope': profile['scope']}
+            for event in events:
+                value = counters.get(event)
+                row[event] = 'N/A' if value is None else f"{value:.0f}"
+            for name in metric_names:
+                row[name] = f"{metrics[name]:.4f}" if name in metrics else 'N/A'
+            writer.writerow(row)
+    print(f"\n✓ Counters saved to {output_csv} "
+          f"({'per timed round' if profile['scope'] == 'kcore' else 'per process'})")
+    
+    def show(value, fmt):
+        return format(value, fmt) if value is not None else 'N/A'
+    
+    print("\nPROFILE:")
+    for graph_name in sorted({result['graph'] for result in results}):
+        print(f"\n{graph_name}:")
+        print(f"  {'Config':<35} {'Time':>10} {'IPC':>6} {'L1 MPKI':>8} "
+              f"{'LLC MPKI':>9} {'Remote MPKI':>12} {'Ctx sw':>8}")
+        for result in sorted((r for r in results if r['graph'] == graph_name),
+                             key=lambda r: r['avg_time']):
+            metrics = derived_metrics(result['counters'])
+            print(f"  {result['config']:<35} {result['avg_time']:>10.6f} "
+                  f"{show(metrics.get('ipc'), '.2f'):>6} "
+                  f"{show(metrics.get('l1_mpki'), '.2f'):>8} "
+                  f"{show(metrics.get('llc_mpki'), '.2f'):>9} "
+                  f"{show(metrics.get('remote_mpki'), '.3f'):>12} "
+                  f"{show(result['counters'].get('context-switches'), '.0f'):>8}")
+
+def batch_evaluate_all_configs(graph_paths, output_csv="batch_results_all_configs.csv",
+                               db_path=None, profile=None,
+                               profile_csv="batch_profile_all_configs.csv"):
+    """Run KCore on multiple graphs with all 8 parameter combinations"""
     
     # Check if KCore directory exists
     if not Path("KCore").exists():
@@ -155,6 +277,10 @@ def batch_evaluate_all_configs(graph_paths, output_csv="batch_results_all_config
     ]
     
     results = []
+    # kcore.h is rewritten for every config, so the commit and the state of the
+    # tree are taken before the first one
+    db = PerfDB(db_path) if db_path else None
+    commit, dirty = git_commit(), git_dirty()
     
     print(f"Running KCore on {len(graph_paths)} graphs with all 8 configurations...")
     print("=" * 80)
@@ -179,16 +305,21 @@ def batch_evaluate_all_configs(graph_paths, output_csv="batch_results_all_config
             
             # Run KCore
             kcore_executable = Path("KCore/kcore")
-            avg_time = run_kcore_on_graph(graph_path, kcore_executable)
+            avg_time, round_times, counters = run_kcore_on_graph(
+                graph_path, kcore_executable, profile)
             
             if avg_time is not None:
+                if db and round_times:
+                    db.record_run(graph_name, config_name, round_times, "",
+                                  commit, dirty)
                 result = {
                     'graph': graph_name,
                     'config': config_name,
                     'enable_sampling': enable_sampling,
                     'enable_local_queue': enable_local_queue,
                     'enable_bucketing': enable_bucketing,
-                    'avg_time': avg_time
+                    'avg_time': avg_time,
+                    'counters': counters
                 }
                 results.append(result)
                 print(f"    ✓ Average time: {avg_time:.6f} seconds")
@@ -252,6 +383,9 @@ def batch_evaluate_all_configs(graph_paths, output_csv="batch_results_all_config
             
             for config_name, time_val in valid_configs:
                 print(f"  {config_name:<25}: {time_val:.6f}s")
+        
+        if profile:
+            write_profile(results, profile, profile_csv)
     else:
         print("No successful runs to save!")
 
@@ -261,9 +395,28 @@ def main():
     parser.add_argument('graphs', nargs='+', help='Graph files to test')
     parser.add_argument('--output', '-o', default='batch_results_all_configs.csv', 
                        help='Output CSV file (default: batch_results_all_configs.csv)')
+    parser.add_argument('--db', default='kcore_perf.db',
+                       help='SQLite performance history, see perf_db.py (default: kcore_perf.db)')
+    parser.add_argument('--no-db', action='store_true',
+                       help='Do not record the runs in the performance history')
+    parser.add_argument('--profile', action='store_true',
+                       help='Collect hardware counters of every run with perf stat')
+    parser.add_argument('--profile-scope', choices=['kcore', 'process'], default='kcore',
+                       help='Count only the timed kcore() rounds, or the whole process (default: kcore)')
+    parser.add_argument('--perf-events', default=','.join(PERF_EVENTS),
+                       help=f'Comma-separated perf events (default: {",".join(PERF_EVENTS)})')
+    parser.add_argument('--profile-output', default='batch_profile_all_configs.csv',
+                       help='Output CSV of the counters (default: batch_profile_all_configs.csv)')
     
     args = parser.parse_args()
     
+    profile = None
+    if args.profile:
+        if not shutil.which("perf"):
+            print("Error: --profile requires perf in PATH")
+            return 1
+        profile = {'events': args.perf_events.split(','), 'scope': args.profile_scope}
+    
     # Convert to absolute paths
     valid_graphs = []
     for graph_file in args.graphs:
@@ -284,7 +437,9 @@ def main():
     print()
     
     # Run batch evaluation with all configurations
-    batch_evaluate_all_configs(valid_graphs, args.output)
+    batch_evaluate_all_configs(valid_graphs, args.output,
+                               None if args.no_db else args.db,
+                               profile, args.profile_output)
     return 0
 
 if __name__ == "__main__":
@@ -21,6 +21,16 @@
 
 class Empty {};
 
+// text edge lists, read by Graph::read_edge_list
+inline bool is_edge_list(const std::string &filename) {
+  size_t idx = filename.find_last_of('.');
+  if (idx == std::string::npos) {
+    return false;
+  }
+  std::string subfix = filename.substr(idx + 1);
+  return subfix == "txt" || subfix == "el";
+}
+
 template <class NodeId, class EdgeTy>
 class WEdge {
  public:
@@ -61,8 +71,8 @@ class Graph {
 
   size_t n;
   size_t m;
-  bool symmetrized;
-  bool weighted;
+  bool symmetrized = false;
+  bool weighted = false;
   parlay::sequence<EdgeId> offsets;
   parlay::sequence<Edge> edges;
   parlay::sequence<EdgeId> in_offsets;
@@ -104,6 +114,14 @@ class Graph {
         parlay::minm<EdgeId>());
   }
 
+  // sorts every adjacency list by neighbor id
+  void sort_neighbors() {
+    parlay::parallel_for(0, n, [&](size_t u) {
+      parlay::sort_inplace(edges.cut(offsets[u], offsets[u + 1]),
+                           [](const Edge &a, const Edge &b) { return a.v < b.v; });
+    });
+  }
+
   void read_pbbs_format(char const *filename) {
     auto chars = parlay::chars_from_file(std::string(filename));
     auto tokens_seq = tokens(chars);
@@ -215,6 +233,208 @@ class Graph {
     ifs.close();
   }
 
+  // the undirected edge {u, v} as a key for symmetric_from_keys
+  static uint64_t edge_key(NodeId u, NodeId v) {
+    return (uint64_t)std::min(u, v) << 32 | std::max(u, v);
+  }
+
+  // Symmetric graph on n vertices from undirected edges given as edge_key
+  // values in any order; self-loops and repeated edges are dropped. The keys
+  // are integer sorted once, and every neighbor list is filled directly: the
+  // larger neighbors of u are the run of keys (u, v), the smaller ones are
+  // counted and then sorted within the list. Peak memory is about twice the
+  // keys, instead of the pair lists and comparison sorts of make_symmetrized.
+  static Graph symmetric_from_keys(size_t n, parlay::sequence<uint64_t> keys) {
+    static_assert(sizeof(NodeId) == 4 && std::is_same_v<EdgeTy, Empty>);
+    parlay::integer_sort_inplace(keys);
+    keys = parlay::pack(
+        keys, parlay::delayed_seq<bool>(keys.size(), [&](size_t i) {
+          return (keys[i] >> 32) != (keys[i] & UINT32_MAX) &&
+                 (i == 0 || keys[i] != keys[i - 1]);
+        }));
+    auto first = [&](size_t i) { return NodeId(keys[i] >> 32); };
+    auto second = [&](size_t i) { return NodeId(keys[i] & UINT32_MAX); };
+
+    size_t num_keys = keys.size();
+    auto smaller = parlay::sequence<EdgeId>(n, 0);
+    auto larger_start = parlay::sequence<EdgeId>(n + 1, num_keys);
+    parlay::parallel_for(0, num_keys, [&](size_t i) {
+      write_add(&smaller[second(i)], 1);
+      if (i == 0 || first(i) != first(i - 1)) {
+        larger_start[first(i)] = i;
+      }
+    });
+    parlay::scan_inclusive_inplace(
+        parlay::make_slice(larger_start.rbegin(), larger_start.rend()),
+        parlay::minm<EdgeId>());
+
+    Graph G;
+    G.n = n;
+    G.m = num_keys * 2;
+    G.symmetrized = true;
+    G.offsets = parlay::tabulate(n + 1, [&](size_t u) {
+      return u == n ? 0 : smaller[u] + larger_start[u + 1] - larger_start[u];
+    });
+    parlay::scan_inplace(G.offsets);
+    G.edges = parlay::sequence<Edge>::uninitialized(G.m);
+    // smaller counts the slots still free for smaller neighbors
+    parlay::parallel_for(0, num_keys, [&](size_t i) {
+      NodeId u = first(i), v = second(i);
+      G.edges[G.offsets[u + 1] - (larger_start[u + 1] - i)] = v;
+      G.edges[G.offsets[v] + fetch_and_add(&smaller[v], -1) - 1] = u;
+    });
+    keys.clear();
+    parlay::parallel_for(
+        0, n,
+        [&](size_t u) {
+          auto start = G.edges.begin() + G.offsets[u];
+          size_t num_smaller = G.offsets[u + 1] - G.offsets[u] -
+                               (larger_start[u + 1] - larger_start[u]);
+          std::sort(start, start + num_smaller);
+        },
+        1);
+    return G;
+  }
+
+  // Text edge list: one edge "u v" per line, separated by spaces, tabs or a
+  // comma, with any further columns ignored. Lines that do not start with a
+  // digit, such as '#' and '%' comments, are skipped. Ids start at 0, or at 1
+  // with one_based, and n is the largest id plus one. Lines are parsed in
+  // parallel blocks straight from the mapped file. With symmetrize the graph
+  // is built by symmetric_from_keys; otherwise it holds every listed edge,
+  // grouped by source with sorted neighbors by an integer sort.
+  void read_edge_list(char const *filename, bool symmetrize,
+                      bool one_based = false) {
+    struct stat sb;
+    int fd = open(filename, O_RDONLY);
+    if (fd == -1) {
+      std::cerr << "Error: Cannot open file " << filename << std::endl;
+      abort();
+    }
+    if (fstat(fd, &sb) == -1) {
+      std::cerr << "Error: Unable to acquire file stat" << std::endl;
+      abort();
+    }
+    size_t len = sb.st_size;
+    char *data = len ? static_cast<char *>(mmap(0, len, PROT_READ,
+                                                 MAP_PRIVATE, fd, 0))
+                     : nullptr;
+    close(fd);
+    if (data == MAP_FAILED) {
+      std::cerr << "Error: Cannot map file " << filename << std::endl;
+      abort();
+    }
+
+    // block b parses the lines starting in [b * block_size, (b + 1) *
+    // block_size)
+    constexpr size_t block_size = 1 << 20;
+    size_t num_blocks = (len + block_size - 1) / block_size;
+    auto line_start = [&](size_t pos) {
+      pos = std::min(pos, len);
+      while (pos > 0 && pos < len && data[pos - 1] != '\n') {
+        pos++;
+      }
+      return pos;
+    };
+    bool bad_line = false;
+    auto for_each_edge = [&](size_t b, auto f) {
+      size_t end = line_start((b + 1) * block_size);
+      for (size_t pos = line_start(b * block_size); pos < end; pos++) {
+        auto digit = [&]() { return data[pos] >= '0' && data[pos] <= '9'; };
+        auto skip = [&]() {
+          while (pos < end && (data[pos] == ' ' || data[pos] == '\t' ||
+                               data[pos] == ',')) {
+            pos++;
+          }
+        };
+        auto parse = [&]() {
+          uint64_t id = 0;
+          for (; pos < end && digit() && id <= UINT32_MAX; pos++) {
+            id = id * 10 + (data[pos] - '0');
+          }
+          return id;
+        };
+        skip();
+        if (pos < end && digit()) {
+          uint64_t u = parse();
+          skip();
+          uint64_t v = pos < end && digit() ? parse() : UINT64_MAX;
+          if (std::max(u, v) - one_based >= UINT32_MAX ||
+              std::min(u, v) < one_based) {
+            bad_line = true;
+          } else {
+            f(NodeId(u - one_based), NodeId(v - one_based));
+          }
+        }
+        while (pos < end && data[pos] != '\n') {
+          pos++;
+        }
+      }
+    };
+    auto counts = parlay::tabulate(num_blocks, [&](size_t b) {
+      size_t count = 0;
+      for_each_edge(b, [&](NodeId, NodeId) { count++; });
+      return count;
+    });
+    size_t num_edges = parlay::scan_inplace(counts);
+    auto keys = parlay::sequence<uint64_t>::uninitialized(num_edges);
+    parlay::parallel_for(
+        0, num_blocks,
+        [&](size_t b) {
+          size_t i = counts[b];
+          for_each_edge(b, [&](NodeId u, NodeId v) {
+            keys[i++] = symmetrize ? edge_key(u, v) : (uint64_t)u << 32 | v;
+          });
+        },
+        1);
+    if (data) {
+      munmap(data, len);
+    }
+    if (bad_line) {
+      std::cerr << "Error: Bad edge in " << filename
+                << (one_based ? " (ids must be in [1, 2^32))"
+                              : " (ids must be in [0, 2^32 - 1))")
+                << std::endl;
+      abort();
+    }
+
+    size_t max_id = parlay::reduce(
+        parlay::delayed_seq<size_t>(num_edges,
+                                    [&](size_t i) {
+                                      return std::max(keys[i] >> 32,
+                                                      keys[i] & UINT32_MAX);
+                                    }),
+        parlay::maxm<size_t>());
+    size_t num_vertices = num_edges ? max_id + 1 : 0;
+    if (symmetrize) {
+      if constexpr (std::is_same_v<EdgeTy, Empty>) {
+        *this = symmetric_from_keys(num_vertices, std::move(keys));
+        return;
+      } else {
+        std::cerr << "Error: Weighted graphs cannot be symmetrized while "
+                     "reading an edge list"
+                  << std::endl;
+        abort();
+      }
+    }
+    parlay::integer_sort_inplace(keys);
+    n = num_vertices;
+    m = num_edges;
+    symmetrized = false;
+    weighted = false;
+    offsets = parlay::sequence<EdgeId>(n + 1, m);
+    edges = parlay::sequence<Edge>::uninitialized(m);
+    parlay::parallel_for(0, m, [&](size_t i) {
+      edges[i] = Edge(NodeId(keys[i] & UINT32_MAX));
+      if (i == 0 || (keys[i] >> 32) != (keys[i - 1] >> 32)) {
+        offsets[keys[i] >> 32] = i;
+      }
+    });
+    parlay::scan_inclusive_inplace(
+        parlay::make_slice(offsets.rbegin(), offsets.rend()),
+        parlay::minm<EdgeId>());
+  }
+
   void read_graph(const char *filename) {
     std::string str_filename(filename);
     if (str_filename.find("hyperlink2012.bin") != std::string::npos) {
@@ -232,6 +452,8 @@ class Graph {
       read_pbbs_format(filename);
     } else if (subfix == "bin") {
       read_binary_format(filename);
+    } else if (is_edge_list(str_filename)) {
+      read_edge_list(filename, false);
     } else {
       std::cerr << "Error: Invalid graph extension" << std::endl;
       abort();
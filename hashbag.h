@@ -106,6 +106,15 @@ class hashbag {
     }
   }
 
+  // the slots of all bags, for memory placement
+  const parlay::sequence<ET> &buffer() const { return pool; }
+
+  // bytes held by the bag
+  size_t memory_usage() const {
+    return pool.size() * sizeof(ET) + samplers.size() * sizeof(Sampler) +
+           (bag_sizes.size() + offsets.size()) * sizeof(size_t);
+  }
+
   parlay::sequence<ET> pack() {
     size_t len = offsets[bag_id] + bag_sizes[bag_id];
     auto pred = parlay::delayed_seq<bool>(
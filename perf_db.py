@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""Performance history of KCore runs in a local SQLite database.
+
+Every run is keyed by git commit, config, graph, machine and thread count, and
+keeps the time of each timed round. The report command compares the rounds of
+a target commit against a baseline commit per graph and flags slowdowns that
+are both large enough and statistically significant.
+
+Usage:
+    python3 perf_db.py run graph1.bin graph2.bin -- -s
+    python3 perf_db.py report --baseline <commit> [--target HEAD] [--dirty]
+    python3 perf_db.py list
+"""
+
+import argparse
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from itertools import combinations
+from math import comb
+from pathlib import Path
+
+DEFAULT_DB = "kcore_perf.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    git_commit TEXT NOT NULL,
+    dirty INTEGER NOT NULL,
+    config TEXT NOT NULL,
+    graph TEXT NOT NULL,
+    machine TEXT NOT NULL,
+    threads INTEGER NOT NULL,
+    args TEXT NOT NULL,
+    avg_time REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    round INTEGER NOT NULL,
+    time REAL NOT NULL,
+    PRIMARY KEY (run_id, round)
+);
+CREATE INDEX IF NOT EXISTS runs_key
+    ON runs (git_commit, config, graph, machine, threads);
+"""
+
+
+def git_commit(rev="HEAD"):
+    """Full hash of a revision, or 'unknown' outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", rev], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def git_dirty():
+    """Whether tracked files differ from the commit"""
+    try:
+        result = subprocess.run(["git", "status", "--porcelain",
+                                 "--untracked-files=no"],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                universal_newlines=True, check=True)
+        return bool(result.stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+
+def num_threads():
+    """Number of Parlay workers a run will use"""
+    return int(os.environ.get("PARLAY_NUM_THREADS", os.cpu_count()))
+
+
+def parse_round_times(output):
+    """Times of the timed rounds printed by kcore (the warmup is excluded)"""
+    return [float(t) for t in re.findall(r'^Round \d+: ([\d.]+)$', output,
+                                         re.MULTILINE)]
+
+
+class PerfDB:
+    """Runs and their round times, stored in SQLite"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def record_run(self, graph, config, round_times, args="", commit=None,
+                   dirty=None):
+        """Store one run of kcore; commit and dirty default to the work tree"""
+        if not round_times:
+            raise ValueError("a run needs at least one round time")
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO runs (timestamp, git_commit, dirty, config, graph, "
+                "machine, threads, args, avg_time) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), commit or git_commit(),
+                 int(git_dirty() if dirty is None else dirty), config, graph,
+                 platform.node(), num_threads(), args,
+                 statistics.mean(round_times)))
+            self.conn.executemany(
+                "INSERT INTO rounds (run_id, round, time) VALUES (?, ?, ?)",
+                [(cur.lastrowid, i, t) for i, t in enumerate(round_times, 1)])
+        return cur.lastrowid
+
+    def commits(self):
+        """Recorded commits with their number of runs, most recent first"""
+        return self.conn.execute(
+            "SELECT git_commit, COUNT(*), MAX(timestamp) FROM runs "
+            "GROUP BY git_commit ORDER BY MAX(timestamp) DESC").fetchall()
+
+    def resolve(self, rev):
+        """The recorded commit matching a revision or a hash prefix"""
+        full = git_commit(rev)
+        matches = [c for c, _, _ in self.commits()
+                   if c == full or c.startswith(rev)]
+        if len(matches) != 1:
+            raise ValueError(f"{rev} matches {len(matches)} recorded commits")
+        return matches[0]
+
+    def samples(self, commit, machine=None, dirty=False):
+        """Round times of a commit per (config, graph, machine, threads), from
+        either the clean runs or the runs with uncommitted changes"""
+        query = ("SELECT config, graph, machine, threads, time FROM runs "
+                 "JOIN rounds ON rounds.run_id = runs.id "
+                 "WHERE git_commit = ? AND dirty = ?")
+        params = [commit, int(dirty)]
+        if machine:
+            query += " AND machine = ?"
+            params.append(machine)
+        groups = {}
+        for config, graph, host, threads, t in self.conn.execute(query, params):
+            groups.setdefault((config, graph, host, threads), []).append(t)
+        return groups
+
+
+def permutation_test(baseline, target, num_permutations=10000, seed=0):
+    """One-sided p-value that the target rounds are slower than the baseline.
+
+    Exact over all splits for small samples, Monte Carlo otherwise.
+    """
+    observed = statistics.mean(target) - statistics.mean(baseline)
+    pooled = baseline + target
+    k = len(target)
+    total = sum(pooled)
+
+    def diff(chosen_sum):
+        return chosen_sum / k - (total - chosen_sum) / len(baseline)
+
+    if comb(len(pooled), k) <= num_permutations:
+        hits = count = 0
+        for chosen in combinations(pooled, k):
+            count += 1
+            hits += diff(sum(chosen)) >= observed - 1e-12
+        return hits / count
+    rng = random.Random(seed)
+    hits = 0
+    for _ in range(num_permutations):
+        hits += diff(sum(rng.sample(pooled, k))) >= observed - 1e-12
+    return (hits + 1) / (num_permutations + 1)
+
+
+def report(db, baseline, target, alpha=0.05, threshold=0.05, machine=None,
+           dirty=False):
+    """Print the change of every (config, graph, machine, threads) recorded for
+    both commits, and return the number of significant slowdowns. Clean runs
+    and runs with uncommitted changes are never pooled"""
+    base_samples = db.samples(baseline, machine, dirty)
+    target_samples = db.samples(target, machine, dirty)
+    keys = sorted(set(base_samples) & set(target_samples))
+    print(f"Baseline {baseline[:12]}, target {target[:12]}"
+          f"{' (uncommitted changes)' if dirty else ''}: "
+          f"{len(keys)} comparable graph/config pairs")
+    if not keys:
+        return 0
+    print(f"{'Graph':<25} {'Config':<34} {'Machine':<12} {'Thr':>4} "
+          f"{'Base':>10} {'Target':>10} {'Change':>8} {'p':>7}")
+    slowdowns = 0
+    for key in keys:
+        config, graph, host, threads = key
+        base, tgt = base_samples[key], target_samples[key]
+        base_median, target_median = statistics.median(base), statistics.median(tgt)
+        change = target_median / base_median - 1
+        p = permutation_test(base, tgt)
+        flag = ""
+        if change > threshold and p < alpha:
+            flag = "  SLOWER"
+            slowdowns += 1
+        elif change < -threshold and permutation_test(tgt, base) < alpha:
+            flag = "  faster"
+        print(f"{graph[:24]:<25} {config[:33]:<34} {host[:11]:<12} "
+              f"{threads:>4} {base_median:>10.6f} {target_median:>10.6f} "
+              f"{change:>+7.1%} {p:>7.4f}{flag}")
+    print(f"\n{slowdowns} significant slowdowns (> {threshold:.0%}, p < {alpha})")
+    return slowdowns
+
+
+def run_graphs(db, graphs, kcore_executable, kcore_args, config):
+    """Run kcore as built on every graph and record the rounds"""
+    commit, dirty = git_commit(), git_dirty()
+    if dirty:
+        print("Warning: the work tree has uncommitted changes")
+    for graph in graphs:
+        cmd = [str(kcore_executable), "-i", str(graph)] + kcore_args
+        result = subprocess.run(cmd, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, universal_newlines=True)
+        round_times = parse_round_times(result.stdout)
+        if result.returncode != 0 or not round_times:
+            print(f"  ✗ {graph}: {result.stderr.strip() or 'no round times'}")
+            continue
+        db.record_run(Path(graph).stem, config, round_times, " ".join(kcore_args),
+                      commit, dirty)
+        print(f"  ✓ {Path(graph).stem}: {statistics.mean(round_times):.6f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KCore performance history")
+    parser.add_argument('--db', default=DEFAULT_DB,
+                        help=f"SQLite database (default: {DEFAULT_DB})")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help="run kcore on graphs and record the times")
+    run.add_argument('graphs', nargs='+')
+    run.add_argument('--kcore', default='KCore/kcore',
+                     help="kcore executable (default: KCore/kcore)")
+    run.add_argument('--config', default='default',
+                     help="name of the build configuration (default: default)")
+    rep = sub.add_parser('report', help="flag slowdowns against a baseline")
+    rep.add_argument('--baseline', required=True,
+                     help="baseline commit (revision or recorded hash prefix)")
+    rep.add_argument('--target', default='HEAD',
+                     help="target commit (default: HEAD)")
+    rep.add_argument('--alpha', type=float, default=0.05,
+                     help="significance level (default: 0.05)")
+    rep.add_argument('--threshold', type=float, default=0.05,
+                     help="minimum relative slowdown (default: 0.05)")
+    rep.add_argument('--machine', help="only compare runs on this machine")
+    rep.add_argument('--dirty', action='store_true',
+                     help="compare the runs made with uncommitted changes, such "
+                     "as those of batch_evaluate_all_configs.py, instead of "
+                     "the clean runs")
+    sub.add_parser('list', help="recorded commits")
+    # everything after -- is passed to kcore
+    argv, kcore_args = sys.argv[1:], []
+    if '--' in argv:
+        argv, kcore_args = argv[:argv.index('--')], argv[argv.index('--') + 1:]
+    args = parser.parse_args(argv)
+
+    with PerfDB(args.db) as db:
+        if args.command == 'run':
+            run_graphs(db, args.graphs, args.kcore, kcore_args, args.config)
+        elif args.command == 'list':
+            for commit, num_runs, last in db.commits():
+                print(f"{commit[:12]}  {num_runs:>5} runs  "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(last))}")
+        elif args.command == 'report':
+            try:
+                baseline = db.resolve(args.baseline)
+                target = db.resolve(args.target)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return 1
+            slowdowns = report(db, baseline, target, args.alpha, args.threshold,
+                               args.machine, args.dirty)
+            return 1 if slowdowns else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,6 +14,12 @@ inline bool atomic_compare_and_swap(ET *a, ET oldval, ET newval) {
     std::memcpy(&r_nval, &newval, sizeof(ET));
     return __sync_bool_compare_and_swap(reinterpret_cast<uint8_t *>(a), r_oval,
                                         r_nval);
+  } else if constexpr (sizeof(ET) == 2) {
+    uint16_t r_oval, r_nval;
+    std::memcpy(&r_oval, &oldval, sizeof(ET));
+    std::memcpy(&r_nval, &newval, sizeof(ET));
+    return __sync_bool_compare_and_swap(reinterpret_cast<uint16_t *>(a), r_oval,
+                                        r_nval);
   } else if constexpr (sizeof(ET) == 4) {
     uint32_t r_oval, r_nval;
     std::memcpy(&r_oval, &oldval, sizeof(ET));
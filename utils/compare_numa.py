@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Compare the NUMA placement policies of kcore against `numactl -i all`.
+
+Every graph is run with `numactl -i all kcore -N none` as the baseline and
+with each policy of -N, and the median of the average round times over the
+repetitions is printed with the share of loads served by a remote node. kcore
+must be built with `make NUMA=1`; on a machine with a single node all policies
+place memory the same way, so the comparison needs a multi-socket machine.
+
+Usage:
+    python3 utils/compare_numa.py data/twitter_sym.bin data/europe_sym.bin -- -s
+"""
+
+import argparse
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+
+POLICIES = ["none", "interleave", "blocked", "replicate"]
+
+
+def run(cmd):
+    """(average round time, remote load share in %) of one kcore run"""
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    avg = re.search(r'^Average time: ([\d.]+)$', result.stdout, re.MULTILINE)
+    if result.returncode != 0 or not avg:
+        print(f"  ✗ {' '.join(cmd)}: {result.stderr.strip()}")
+        return None, None
+    remote = re.search(r'remote: \d+ \(([\d.]+)%\)', result.stdout)
+    return float(avg.group(1)), float(remote.group(1)) if remote else None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare kcore NUMA policies against numactl -i all")
+    parser.add_argument('graphs', nargs='+')
+    parser.add_argument('--kcore', default='KCore/kcore',
+                        help="kcore executable built with NUMA=1 "
+                        "(default: KCore/kcore)")
+    parser.add_argument('--repeats', type=int, default=3,
+                        help="runs per policy (default: 3)")
+    # everything after -- is passed to kcore
+    argv, kcore_args = sys.argv[1:], []
+    if '--' in argv:
+        argv, kcore_args = argv[:argv.index('--')], argv[argv.index('--') + 1:]
+    args = parser.parse_args(argv)
+
+    setups = [(policy, [args.kcore, '-N', policy]) for policy in POLICIES]
+    if shutil.which('numactl'):
+        setups.insert(0, ("numactl -i all",
+                          ['numactl', '-i', 'all', args.kcore, '-N', 'none']))
+    else:
+        print("Warning: numactl not found, comparing against -N none")
+
+    for graph in args.graphs:
+        print(f"\n{graph}:")
+        print(f"  {'Placement':<16} {'Time':>10} {'Speedup':>8} {'Remote':>8}")
+        baseline = None
+        for name, cmd in setups:
+            runs = [run(cmd + ['-i', graph] + kcore_args)
+                    for _ in range(args.repeats)]
+            times = [t for t, _ in runs if t is not None]
+            if not times:
+                continue
+            median = statistics.median(times)
+            baseline = baseline or median
+            remote = [r for _, r in runs if r is not None]
+            share = f"{statistics.median(remote):.1f}%" if remote else "N/A"
+            print(f"  {name:<16} {median:>10.6f} {baseline / median:>7.2f}x "
+                  f"{share:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
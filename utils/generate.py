@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Generate series of synthetic symmetric .bin graphs with utils/generator.
+
+Every size given on the command line produces one graph, so a scaling study
+is a single call. Graphs are named after their parameters, and existing files
+are kept unless --force is given.
+
+Build the generator first:
+    make -C utils generator
+
+Usage:
+    python3 utils/generate.py -o data grid 1000x1000 10000x10000 --prob 0.3
+    python3 utils/generate.py -o data grid 100x100x100
+    python3 utils/generate.py -o data chain 1e7 1e8
+    python3 utils/generate.py -o data rmat 20 22 24 --edge-factor 16
+    python3 utils/generate.py -o data chunglu 1e6 1e7 --degree 20 --exponent 2.1
+    python3 utils/generate.py -o data core 1e7 --degree 10 --core-size 5000
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+DEFAULT_GENERATOR = Path(__file__).resolve().parent / "generator"
+
+
+def count(value):
+    """Sizes such as 1e7 or 10000000"""
+    return int(float(value))
+
+
+def tag(x):
+    """Short form of a real parameter for file names, e.g. 0.3 -> 03"""
+    return f"{x:g}".replace('.', '')
+
+
+def jobs(args):
+    """(file name, generator options) for every requested size"""
+    common = ['-r', str(args.seed)] + (['-P'] if args.permute else [])
+    suffix = (f"_s{args.seed}" if args.seed != 1 else "") + \
+        ("_perm" if args.permute else "") + "_sym.bin"
+    for size in args.sizes:
+        if args.type == 'grid':
+            dims = [count(d) for d in size.split('x')]
+            if len(dims) not in (2, 3):
+                raise ValueError(f"grid size {size} is not XxY or XxYxZ")
+            dims += [1] * (3 - len(dims))
+            name = "grid_" + "_".join(str(d) for d in
+                                      (dims if dims[2] > 1 else dims[:2]))
+            if args.prob < 1:
+                name += "_" + tag(args.prob)
+            opts = ['-x', dims[0], '-y', dims[1], '-z', dims[2], '-p', args.prob]
+        elif args.type == 'chain':
+            name = f"chain_{size}"
+            opts = ['-n', count(size)]
+        elif args.type == 'rmat':
+            name = f"rmat_{size}_{args.edge_factor}"
+            opts = ['-l', size, '-e', args.edge_factor,
+                    '-a', args.a, '-b', args.b, '-c', args.c]
+        elif args.type == 'chunglu':
+            name = f"chunglu_{size}_{tag(args.degree)}_{tag(args.exponent)}"
+            opts = ['-n', count(size), '-d', args.degree, '-g', args.exponent]
+        else:
+            name = (f"core_{size}_{tag(args.degree)}_{args.core_size}_"
+                    f"{tag(args.core_density)}")
+            opts = ['-n', count(size), '-d', args.degree,
+                    '-k', args.core_size, '-q', args.core_density]
+        yield name + suffix, ['-t', args.type] + [str(o) for o in opts] + common
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic symmetric .bin graphs")
+    parser.add_argument('-o', '--output-dir', default='.',
+                        help="directory of the graphs (default: .)")
+    parser.add_argument('--generator', default=str(DEFAULT_GENERATOR),
+                        help=f"generator executable (default: {DEFAULT_GENERATOR})")
+    parser.add_argument('--seed', type=int, default=1,
+                        help="random seed (default: 1)")
+    parser.add_argument('--permute', action='store_true',
+                        help="relabel vertices by a random permutation")
+    parser.add_argument('--force', action='store_true',
+                        help="overwrite existing graphs")
+    sub = parser.add_subparsers(dest='type', required=True)
+    grid = sub.add_parser('grid', help="2D or 3D lattice")
+    grid.add_argument('sizes', nargs='+', help="XxY or XxYxZ")
+    grid.add_argument('--prob', type=float, default=1,
+                      help="probability to keep each lattice edge (default: 1)")
+    chain = sub.add_parser('chain', help="path")
+    chain.add_argument('sizes', nargs='+', help="number of vertices")
+    rmat = sub.add_parser('rmat', help="RMAT / Kronecker")
+    rmat.add_argument('sizes', nargs='+', type=int,
+                      help="log2 of the number of vertices")
+    rmat.add_argument('--edge-factor', type=int, default=16,
+                      help="edges per vertex before merging (default: 16)")
+    rmat.add_argument('-a', type=float, default=0.57)
+    rmat.add_argument('-b', type=float, default=0.19)
+    rmat.add_argument('-c', type=float, default=0.19)
+    chung_lu = sub.add_parser('chunglu', help="Chung-Lu power law")
+    chung_lu.add_argument('sizes', nargs='+', help="number of vertices")
+    chung_lu.add_argument('--degree', type=float, default=10,
+                          help="average degree before merging (default: 10)")
+    chung_lu.add_argument('--exponent', type=float, default=2.5,
+                          help="power-law exponent (default: 2.5)")
+    core = sub.add_parser('core', help="random graph with a planted dense core")
+    core.add_argument('sizes', nargs='+', help="number of vertices")
+    core.add_argument('--degree', type=float, default=10,
+                      help="background average degree (default: 10)")
+    core.add_argument('--core-size', type=count, required=True)
+    core.add_argument('--core-density', type=float, default=1,
+                      help="edge probability within the core (default: 1)")
+    args = parser.parse_args()
+
+    if not Path(args.generator).exists():
+        print(f"Error: {args.generator} not found, build it with "
+              f"`make -C utils generator`")
+        return 1
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        graphs = list(jobs(args))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    for name, opts in graphs:
+        path = output_dir / name
+        if path.exists() and not args.force:
+            print(f"  - {path} exists, skipping")
+            continue
+        print(f"  {path}")
+        sys.stdout.flush()
+        result = subprocess.run([args.generator, '-o', str(path)] + opts)
+        if result.returncode != 0:
+            print(f"  ✗ Generating {path} failed")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+#include <algorithm>
+#include <cmath>
+#include <string>
+
+#include "graph.h"
+#include "parlay/internal/get_time.h"
+#include "parlay/primitives.h"
+#include "parlay/random.h"
+
+typedef uint32_t NodeId;
+typedef uint64_t EdgeId;
+
+// Synthetic symmetric graphs written in the .bin format. Every generator
+// describes the graph as num_edges undirected candidate edges, where
+// edge(i) is a deterministic function of i and the seed; candidates that are
+// self-loops are dropped (generators use them to skip an edge) and repeated
+// edges are merged. The result therefore depends only on the parameters and
+// the seed, not on the number of threads.
+
+// uniform double in [0, 1) from a 64-bit hash
+double to_unit(uint64_t x) { return (x >> 11) * 0x1.0p-53; }
+
+// label maps the generated ids to the written ones, or is empty to keep them
+template <class F>
+Graph<NodeId, EdgeId> build_symmetric(size_t n, size_t num_edges, F edge,
+                                      const parlay::sequence<NodeId> &label) {
+  auto keys = parlay::tabulate(num_edges, [&](size_t i) {
+    auto [u, v] = edge(i);
+    if (!label.empty()) {
+      u = label[u];
+      v = label[v];
+    }
+    return Graph<NodeId, EdgeId>::edge_key(u, v);
+  });
+  return Graph<NodeId, EdgeId>::symmetric_from_keys(n, std::move(keys));
+}
+
+// x * y * z lattice, every vertex linked to its next neighbor along each axis
+// with probability p
+Graph<NodeId, EdgeId> grid(size_t x, size_t y, size_t z, double p,
+                           parlay::random r,
+                           const parlay::sequence<NodeId> &label) {
+  size_t n = x * y * z;
+  auto edge = [&](size_t i) {
+    NodeId u = i / 3;
+    size_t axis = i % 3;
+    size_t coord[3] = {u % x, u / x % y, u / x / y};
+    size_t dims[3] = {x, y, z};
+    size_t strides[3] = {1, x, x * y};
+    if (coord[axis] + 1 == dims[axis] || to_unit(r.ith_rand(i)) >= p) {
+      return std::make_pair(u, u);
+    }
+    return std::make_pair(u, NodeId(u + strides[axis]));
+  };
+  return build_symmetric(n, n * 3, edge, label);
+}
+
+Graph<NodeId, EdgeId> chain(size_t n,
+                            const parlay::sequence<NodeId> &label) {
+  auto edge = [&](size_t i) {
+    return std::make_pair(NodeId(i), NodeId(i + 1));
+  };
+  return build_symmetric(n, n - 1, edge, label);
+}
+
+// recursive matrix: each edge picks one of the four quadrants at every level
+// with probabilities a, b, c and 1 - a - b - c
+Graph<NodeId, EdgeId> rmat(size_t scale, size_t edge_factor, double a,
+                           double b, double c, parlay::random r,
+                           const parlay::sequence<NodeId> &label) {
+  size_t n = size_t(1) << scale;
+  auto edge = [&](size_t i) {
+    auto ri = r.fork(i);
+    NodeId u = 0, v = 0;
+    for (size_t level = 0; level < scale; level++) {
+      double x = to_unit(ri.ith_rand(level));
+      u = u << 1 | (x >= a + b);
+      v = v << 1 | ((x >= a && x < a + b) || x >= a + b + c);
+    }
+    return std::make_pair(u, v);
+  };
+  return build_symmetric(n, n * edge_factor, edge, label);
+}
+
+// endpoints drawn with probability proportional to (i + 1) ^ (-1 / (gamma -
+// 1)), giving a power-law degree distribution with exponent gamma
+Graph<NodeId, EdgeId> chung_lu(size_t n, double avg_degree, double gamma,
+                               parlay::random r,
+                               const parlay::sequence<NodeId> &label) {
+  auto weights = parlay::tabulate(
+      n, [&](size_t i) { return std::pow(i + 1.0, -1.0 / (gamma - 1)); });
+  double total = parlay::scan_inclusive_inplace(weights);
+  auto pick = [&](uint64_t x) {
+    double target = to_unit(x) * total;
+    size_t id = std::upper_bound(weights.begin(), weights.end(), target) -
+                weights.begin();
+    return NodeId(std::min(id, n - 1));
+  };
+  auto edge = [&](size_t i) {
+    auto ri = r.fork(i);
+    return std::make_pair(pick(ri.ith_rand(0)), pick(ri.ith_rand(1)));
+  };
+  return build_symmetric(n, n * avg_degree / 2, edge, label);
+}
+
+// uniform random background with the given average degree, plus a planted
+// core on vertices [0, core_size) where each of the core_size * (core_size -
+// 1) / 2 pairs is linked independently with probability core_density
+Graph<NodeId, EdgeId> planted_core(size_t n, double avg_degree,
+                                   size_t core_size, double core_density,
+                                   parlay::random r,
+                                   const parlay::sequence<NodeId> &label) {
+  size_t background = n * avg_degree / 2;
+  size_t pairs = core_size * (core_size - 1) / 2;
+  auto edge = [&](size_t i) {
+    auto ri = r.fork(i);
+    if (i < background) {
+      return std::make_pair(NodeId(ri.ith_rand(0) % n),
+                            NodeId(ri.ith_rand(1) % n));
+    }
+    // the t-th pair (u, v) with u < v, in the order of v and then u
+    size_t t = i - background;
+    size_t v = (1 + std::sqrt(1 + 8.0 * t)) / 2;
+    while (v * (v - 1) / 2 > t) {
+      v--;
+    }
+    while ((v + 1) * v / 2 <= t) {
+      v++;
+    }
+    NodeId u = t - v * (v - 1) / 2;
+    if (to_unit(ri.ith_rand(0)) >= core_density) {
+      return std::make_pair(u, u);
+    }
+    return std::make_pair(u, NodeId(v));
+  };
+  return build_symmetric(n, background + pairs, edge, label);
+}
+
+int main(int argc, char *argv[]) {
+  if (argc == 1) {
+    fprintf(stderr,
+            "Usage: %s -t type -o output_file [options]\n"
+            "Types and their options:\n"
+            "\tgrid,\t-x, -y, -z: dimensions (-z 1 for 2D), -p: edge "
+            "probability\n"
+            "\tchain,\t-n: number of vertices\n"
+            "\trmat,\t-l: log2 of vertices, -e: edges per vertex, -a, -b, -c: "
+            "quadrant probabilities\n"
+            "\tchunglu,\t-n: number of vertices, -d: average degree, -g: "
+            "power-law exponent\n"
+            "\tcore,\t-n: number of vertices, -d: background average degree, "
+            "-k: core size, -q: core density\n"
+            "Options:\n"
+            "\t-r,\tseed (default 1)\n"
+            "\t-P,\trelabel vertices by a random permutation\n",
+            argv[0]);
+    return 0;
+  }
+  char c;
+  std::string type;
+  char const *output_path = nullptr;
+  size_t n = 0, x = 0, y = 0, z = 1, log_n = 0, edge_factor = 16,
+         core_size = 0;
+  double p = 1, avg_degree = 10, gamma = 2.5, a = 0.57, b = 0.19, c_prob = 0.19,
+         core_density = 1;
+  uint64_t seed = 1;
+  bool relabel = false;
+  while ((c = getopt(argc, argv, "t:o:n:x:y:z:p:l:e:a:b:c:d:g:k:q:r:P")) !=
+         -1) {
+    switch (c) {
+      case 't':
+        type = optarg;
+        break;
+      case 'o':
+        output_path = optarg;
+        break;
+      case 'n':
+        n = atof(optarg);
+        break;
+      case 'x':
+        x = atof(optarg);
+        break;
+      case 'y':
+        y = atof(optarg);
+        break;
+      case 'z':
+        z = atof(optarg);
+        break;
+      case 'p':
+        p = atof(optarg);
+        break;
+      case 'l':
+        log_n = atol(optarg);
+        break;
+      case 'e':
+        edge_factor = atol(optarg);
+        break;
+      case 'a':
+        a = atof(optarg);
+        break;
+      case 'b':
+        b = atof(optarg);
+        break;
+      case 'c':
+        c_prob = atof(optarg);
+        break;
+      case 'd':
+        avg_degree = atof(optarg);
+        break;
+      case 'g':
+        gamma = atof(optarg);
+        break;
+      case 'k':
+        core_size = atof(optarg);
+        break;
+      case 'q':
+        core_density = atof(optarg);
+        break;
+      case 'r':
+        seed = strtoull(optarg, nullptr, 10);
+        break;
+      case 'P':
+        relabel = true;
+        break;
+      default:
+        std::cerr << "Error: Unknown option " << (char)optopt << std::endl;
+        abort();
+    }
+  }
+  if (!output_path) {
+    std::cerr << "Error: No output path provided" << std::endl;
+    abort();
+  }
+  size_t num_vertices = type == "grid"   ? x * y * z
+                        : type == "rmat" ? size_t(1) << log_n
+                                         : n;
+  if (num_vertices < 2 || num_vertices > UINT32_MAX) {
+    std::cerr << "Error: The number of vertices must be in [2, 2^32)"
+              << std::endl;
+    abort();
+  }
+
+  parlay::random r(seed);
+  parlay::internal::timer t;
+  parlay::sequence<NodeId> label;
+  if (relabel) {
+    label = parlay::random_permutation<NodeId>(num_vertices, r.fork(0));
+    r = r.fork(1);
+  }
+  Graph<NodeId, EdgeId> G;
+  if (type == "grid") {
+    G = grid(x, y, z, p, r, label);
+  } else if (type == "chain") {
+    G = chain(n, label);
+  } else if (type == "rmat") {
+    if (a + b + c_prob > 1) {
+      std::cerr << "Error: a + b + c must be at most 1" << std::endl;
+      abort();
+    }
+    G = rmat(log_n, edge_factor, a, b, c_prob, r, label);
+  } else if (type == "chunglu") {
+    if (gamma <= 1) {
+      std::cerr << "Error: The power-law exponent must be greater than 1"
+                << std::endl;
+      abort();
+    }
+    G = chung_lu(n, avg_degree, gamma, r, label);
+  } else if (type == "core") {
+    if (core_size < 2 || core_size > n) {
+      std::cerr << "Error: The core size must be in [2, n]" << std::endl;
+      abort();
+    }
+    G = planted_core(n, avg_degree, core_size, core_density, r, label);
+  } else {
+    std::cerr << "Error: Unknown graph type " << type << std::endl;
+    abort();
+  }
+  t.stop();
+  printf("Generated %s: |V|=%zu, |E|=%zu, %f s\n", type.c_str(), G.n, G.m,
+         t.total_time());
+
+  t.reset();
+  t.start();
+  G.write_binary_format(output_path);
+  t.stop();
+  size_t bytes =
+      (G.n + 1) * sizeof(EdgeId) + G.m * sizeof(NodeId) + 3 * sizeof(size_t);
+  printf("Wrote %s: %zu bytes, %f s\n", output_path, bytes, t.total_time());
+  return 0;
+}
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Pack symmetric .bin graphs into one .batch file for kcore.
+
+The batch holds the graphs as one concatenated CSR: num_graphs, n and m as
+uint64, then the first vertex of every graph (num_graphs + 1 uint64), the
+offsets (n + 1 uint64) and the edges (m uint32) with ids local to each graph.
+The graphs must be symmetric, without self-loops or repeated edges.
+
+Usage:
+    python3 utils/make_batch.py -o egos.batch ego_*.bin
+    ./KCore/kcore -i egos.batch -o egos.core
+"""
+
+import argparse
+import struct
+import sys
+from array import array
+
+
+def read_bin(path):
+    """(n, offsets, edges) of a .bin graph"""
+    with open(path, 'rb') as f:
+        n, m, _ = struct.unpack('<3Q', f.read(24))
+        offsets = array('Q')
+        offsets.fromfile(f, n + 1)
+        edges = array('I')
+        edges.fromfile(f, m)
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+        edges.byteswap()
+    return n, offsets, edges
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pack symmetric .bin graphs into a .batch file")
+    parser.add_argument('graphs', nargs='+', help="symmetric .bin graphs")
+    parser.add_argument('-o', '--output', required=True,
+                        help="output .batch file")
+    args = parser.parse_args()
+
+    starts = array('Q', [0])
+    offsets = array('Q')
+    edges = array('I')
+    for path in args.graphs:
+        n, graph_offsets, graph_edges = read_bin(path)
+        base = len(edges)
+        offsets.extend(base + o for o in graph_offsets[:-1])
+        edges.extend(graph_edges)
+        starts.append(starts[-1] + n)
+    offsets.append(len(edges))
+    if sys.byteorder != 'little':
+        for a in (starts, offsets, edges):
+            a.byteswap()
+    with open(args.output, 'wb') as f:
+        f.write(struct.pack('<3Q', len(args.graphs), len(offsets) - 1,
+                            len(edges)))
+        starts.tofile(f)
+        offsets.tofile(f)
+        edges.tofile(f)
+    print(f"Wrote {args.output}: {len(args.graphs)} graphs, "
+          f"|V|={len(offsets) - 1}, |E|={len(edges)}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,24 +1,74 @@
+#include <sys/resource.h>
+#include <sys/wait.h>
+
 #include "graph.h"
+#include "parlay/internal/get_time.h"
 
 typedef uint32_t NodeId;
 typedef uint64_t EdgeId;
 typedef float EdgeTy;
 
+// An edge list is symmetrized while it is read (direct), or read as listed and
+// passed to make_symmetrized like the other formats
+Graph<NodeId, EdgeId> symmetrize_edge_list(char const* input_path,
+                                           bool one_based, bool direct) {
+  Graph<NodeId, EdgeId> G;
+  G.read_edge_list(input_path, direct, one_based);
+  if (!direct) {
+    G = make_symmetrized(G);
+  }
+  return G;
+}
+
+// runs both paths on an edge list, each in its own process so that the peak
+// memory of one does not include the other
+void compare_paths(char const* input_path, bool one_based) {
+  for (bool direct : {false, true}) {
+    char const* name = direct ? "Direct" : "make_symmetrized";
+    fflush(stdout);
+    pid_t pid = fork();
+    if (pid == 0) {
+      parlay::internal::timer t;
+      auto G = symmetrize_edge_list(input_path, one_based, direct);
+      t.stop();
+      auto hashes = parlay::delayed_seq<uint64_t>(G.m, [&](size_t i) {
+        return parlay::hash64(i << 32 | G.edges[i].v);
+      });
+      printf("%s: |V|=%zu, |E|=%zu, checksum %016llx, %f s\n", name, G.n, G.m,
+             (unsigned long long)parlay::reduce(hashes), t.total_time());
+      exit(0);
+    }
+    int status;
+    rusage usage;
+    if (pid < 0 || wait4(pid, &status, 0, &usage) != pid ||
+        !WIFEXITED(status) || WEXITSTATUS(status) != 0) {
+      std::cerr << "Error: " << name << " failed" << std::endl;
+      abort();
+    }
+    printf("%s: peak memory %.1f MB\n", name, usage.ru_maxrss / 1024.0);
+  }
+}
+
 int main(int argc, char* argv[]) {
   if (argc == 1) {
     fprintf(stderr,
-            "Usage: %s [-i input_file] [-o output file]\n"
+            "Usage: %s [-i input_file] [-o output file] [-1] [-c]\n"
             "Options:\n"
-            "\t-i,\tinput file path\n"
-            "\t-o,\toutput file path\n",
+            "\t-i,\tinput file path (.adj, .bin, or .txt/.el edge list)\n"
+            "\t-o,\toutput file path\n"
+            "\t-1,\tvertex ids in the edge list start at 1\n"
+            "\t-c,\tcompare the time and peak memory of symmetrizing the "
+            "edge list while reading it and with make_symmetrized\n",
             argv[0]);
     return 0;
   }
 
   char const* input_path = nullptr;
   char const* output_path = nullptr;
+  bool one_based = false;
+  bool compare = false;
   char c;
-  while ((c = getopt(argc, argv, "i:o:")) != -1) {
+  while ((c = getopt(argc, argv, "i:o:1c")) != -1) {
     switch (c) {
       case 'i':
         input_path = optarg;
@@ -26,11 +76,35 @@ int main(int argc, char* argv[]) {
       case 'o':
         output_path = optarg;
         break;
+      case '1':
+        one_based = true;
+        break;
+      case 'c':
+        compare = true;
+        break;
       default:
         std::cerr << "Error: Unknown option " << optopt << std::endl;
         abort();
     }
   }
+  if (!input_path || (!compare && !output_path)) {
+    std::cerr << "Error: No input or output path provided" << std::endl;
+    abort();
+  }
+  if (is_edge_list(input_path)) {
+    if (compare) {
+      compare_paths(input_path, one_based);
+      return 0;
+    }
+    printf("Reading graph...\n");
+    auto G = symmetrize_edge_list(input_path, one_based, true);
+    G.write_binary_format(output_path);
+    return 0;
+  }
+  if (compare) {
+    std::cerr << "Error: -c requires an edge list" << std::endl;
+    abort();
+  }
   printf("Reading graph...\n");
   Graph<NodeId, EdgeId, EdgeTy> G;
   G.read_graph(input_path);